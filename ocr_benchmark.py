@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CLOVA OCR 업로드 방식 비교 벤치마크
+base64 JSON 업로드(json)와 바이너리 multipart 업로드(multipart)의
+요청 본문 크기, 요청 생성 시간, (선택) 실제 API 왕복 지연 시간을 비교합니다.
+절감량은 이전 방식(크기만 줄인 이미지를 PNG로 인코딩해 base64 JSON으로 전송)의 요청 본문 기준입니다.
+
+사용법:
+    python ocr_benchmark.py image1.jpg image2.png
+    python ocr_benchmark.py --live --repeat 3 image1.jpg   # 실제 API 호출 (과금 주의)
+"""
+
+import argparse
+import statistics
+import time
+
+from tg import Config, ClovaOcrClient
+
+MODES = ('json', 'multipart')
+
+
+def prepare_body(img_bytes, mode, fmt):
+    """실제 전송될 HTTP 요청 본문을 만들어 (본문 크기, 생성 시간 ms) 반환"""
+    start = time.perf_counter()
+    size = ClovaOcrClient.body_size(img_bytes, mode, fmt)
+    elapsed = (time.perf_counter() - start) * 1000
+    return size, elapsed
+
+
+def measure_live(client, img_bytes, fmt, mode, repeat):
+    """실제 API 호출 왕복 시간 목록 (ms)"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.post(img_bytes, mode, fmt)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            print(f"  [{mode}] API 오류: 상태 코드 {response.status_code}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLOVA OCR 업로드 방식 비교")
+    parser.add_argument('images', nargs='+', help="비교할 이미지 파일")
+    parser.add_argument('--live', action='store_true', help="실제 CLOVA OCR API를 호출해 지연 시간 측정")
+    parser.add_argument('--repeat', type=int, default=3, help="방식별 API 호출 횟수 (--live)")
+    args = parser.parse_args()
+
+    client = ClovaOcrClient(max_concurrency=1) if args.live else None
+    if args.live and (not Config.CLOVA_OCR_API_URL or not Config.CLOVA_OCR_SECRET_KEY):
+        parser.error("--live 사용 시 CLOVA_OCR_API_URL과 CLOVA_OCR_SECRET_KEY가 필요합니다.")
+
+    print("=" * 70)
+    for image_path in args.images:
+        prepared = ClovaOcrClient.preprocess(image_path, image_path)
+        if prepared is None:
+            continue
+        img_bytes, fmt, _, resized = prepared
+        baseline = ClovaOcrClient.baseline_body_size(resized)
+        print(f"{image_path}: 인코딩된 이미지 {fmt} {len(img_bytes):,} bytes, "
+              f"이전 방식(PNG base64 JSON) 요청 본문 {baseline:,} bytes")
+
+        for mode in MODES:
+            size, build_ms = prepare_body(img_bytes, mode, fmt)
+            saved = baseline - size
+            print(f"  [{mode:9}] 요청 본문 {size:>12,} bytes, 생성 {build_ms:7.2f} ms, "
+                  f"이전 방식 대비 {saved:,} bytes 절감 ({saved / baseline * 100:.1f}%)")
+
+        if client:
+            for mode in MODES:
+                latencies = measure_live(client, img_bytes, fmt, mode, args.repeat)
+                print(f"  [{mode:9}] 왕복 지연 중앙값 {statistics.median(latencies):8.1f} ms "
+                      f"(최소 {min(latencies):.1f} / 최대 {max(latencies):.1f}, {len(latencies)}회)")
+        print("-" * 70)
+
+    if client:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
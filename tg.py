@@ -1,4 +1,5 @@
 from telethon import TelegramClient, events
+from telethon.errors import FloodWaitError
 from telethon.tl.types import User, MessageMediaPhoto
 from dotenv import load_dotenv
 import os
@@ -21,13 +22,19 @@ import pyautogui
 import hashlib
 from collections import OrderedDict
 import json
+import sqlite3
+from array import array
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import heapq
+import itertools
+import random
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future
 import cv2
 import numpy as np
 import pyperclip
-import functools
-import signal
 from io import BytesIO
 from PIL import Image
 import requests
@@ -91,11 +98,18 @@ class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     TARGET_GROUP = int(os.getenv("TARGET_GROUP", "0"))
     KEYWORD = os.getenv("KEYWORD", "open.kakao.com")
+    # 감지할 링크 키워드 목록 (쉼표로 구분, 예: open.kakao.com,invite.example.com)
+    KEYWORDS = [k.strip() for k in os.getenv("KEYWORDS", KEYWORD).split(",") if k.strip()]
+    KEYWORD_CASE_INSENSITIVE = os.getenv("KEYWORD_CASE_INSENSITIVE", "False").lower() == "true"
     CHROME_DRIVER_PATH = os.getenv("CHROME_DRIVER_PATH")
     EXCLUDED_GROUP_IDS = os.getenv("EXCLUDED_GROUP_IDS", "").split(",")
     EXCLUDED_KEYWORDS = os.getenv("EXCLUDED_KEYWORDS", "").split(",")
     IMAGE_DIR = os.getenv("IMAGE_DIR", "image")
     
+    # 중복 메시지 캐시 (SQLite WAL 파일, 중복 검사 범위)
+    MESSAGE_CACHE_DB = os.getenv("MESSAGE_CACHE_DB", "message_cache.db")
+    MESSAGE_CACHE_SIZE = int(os.getenv("MESSAGE_CACHE_SIZE", "1000000"))
+    
     # 디버그 모드 설정
     DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
     
@@ -104,20 +118,84 @@ class Config:
     CLOVA_OCR_SECRET_KEY = os.getenv("CLOVA_OCR_SECRET_KEY", "")
     
     MAX_IMAGE_DIMENSION = int(os.getenv("MAX_IMAGE_DIMENSION", "1600"))
+    # 사진을 메모리로 다운로드해 디코딩 (False면 IMAGE_DIR에 임시 파일로 저장)
+    IN_MEMORY_MEDIA = os.getenv("IN_MEMORY_MEDIA", "True").lower() == "true"
+    # 알림에 원본 사진 포함 (다시 업로드하지 않고 텔레그램 서버의 원본을 참조하거나 전달)
+    NOTIFY_WITH_MEDIA = os.getenv("NOTIFY_WITH_MEDIA", "True").lower() == "true"
+    # 알림 라우팅 (규칙은 ;로 구분, 각 규칙은 출처=대상1,대상2)
+    # 출처: 채팅방 ID, kw:키워드(링크에 포함된 키워드), *(그 외 모든 메시지). 규칙이 없거나 맞는 규칙이 없으면 TARGET_GROUP
+    NOTIFY_ROUTES = os.getenv("NOTIFY_ROUTES", "")
+    # 알림 전송 속도 제한 (대상 채팅방마다 분당 메시지 수, 연속 전송 허용 수)
+    NOTIFY_RATE_PER_MINUTE = float(os.getenv("NOTIFY_RATE_PER_MINUTE", "20"))
+    NOTIFY_BURST = int(os.getenv("NOTIFY_BURST", "3"))
+    # 알림을 보낸 링크가 이 시간(초) 안에 다른 채팅방에서 다시 보이면 새 알림 대신 기존 알림에 채팅방별 횟수 표시
+    NOTIFY_COALESCE_WINDOW = int(os.getenv("NOTIFY_COALESCE_WINDOW", "600"))
+    # 전송 대기 요청이 이 수 이상이면 채팅방별 횟수만 갱신하는 수정은 보내지 않음 (횟수는 다음 수정 때 반영)
+    NOTIFY_TALLY_MAX_BACKLOG = int(os.getenv("NOTIFY_TALLY_MAX_BACKLOG", "5"))
+    # 브라우저가 비밀번호 입력 단계에서 OCR 결과를 기다리는 최대 시간 (초과 시 비밀번호 없이 진행)
+    OCR_PASSWORD_WAIT = float(os.getenv("OCR_PASSWORD_WAIT", "10"))
+    OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "2"))  # 동시 OCR 요청 수
+    OCR_UPLOAD_MODE = os.getenv("OCR_UPLOAD_MODE", "multipart").lower()  # multipart 또는 json(base64)
+    
+    # OCR 이미지 전처리/인코딩 설정
+    OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "True").lower() == "true"
+    OCR_NORMALIZE_CONTRAST = os.getenv("OCR_NORMALIZE_CONTRAST", "True").lower() == "true"
+    OCR_BINARIZE = os.getenv("OCR_BINARIZE", "False").lower() == "true"
+    OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "90"))
+    OCR_MIN_JPEG_QUALITY = int(os.getenv("OCR_MIN_JPEG_QUALITY", "60"))
+    OCR_MAX_UPLOAD_BYTES = int(os.getenv("OCR_MAX_UPLOAD_BYTES", str(1024 * 1024)))  # 업로드 바이트 예산
+    
+    # OCR 결과 캐시 설정 (해시 크기가 클수록 비슷한 이미지를 더 잘 구분, 거리 0은 완전 일치만 허용)
+    OCR_CACHE_FILE = os.getenv("OCR_CACHE_FILE", "ocr_cache.json")
+    OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "5000"))
+    OCR_CACHE_HASH_SIZE = int(os.getenv("OCR_CACHE_HASH_SIZE", "16"))
+    OCR_CACHE_MAX_DISTANCE = int(os.getenv("OCR_CACHE_MAX_DISTANCE", "0"))
     NUM_WORKERS = int(os.getenv("NUM_WORKERS", "3"))
     
+    # 브라우저 풀 설정 (사전 실행 인스턴스 수, 최대 인스턴스 수, 유휴 인스턴스 정리 시간)
+    BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", str(NUM_WORKERS)))
+    BROWSER_POOL_MAX = int(os.getenv("BROWSER_POOL_MAX", str(max(NUM_WORKERS, BROWSER_POOL_SIZE))))
+    BROWSER_IDLE_TIMEOUT = int(os.getenv("BROWSER_IDLE_TIMEOUT", "300"))
+    
     # 타임아웃 설정
     URL_TIMEOUT = int(os.getenv('URL_TIMEOUT', '30'))  # URL 처리 타임아웃 (초)
     NAVIGATION_TIMEOUT = int(os.getenv('NAVIGATION_TIMEOUT', '15'))  # 페이지 로딩 타임아웃 (초)
+    BROWSER_RESET_TIMEOUT = int(os.getenv('BROWSER_RESET_TIMEOUT', '5'))  # 중단된 작업의 브라우저 초기화 제한 시간 (초)
     CLICK_TIMEOUT = int(os.getenv('CLICK_TIMEOUT', '10'))  # 클릭 타임아웃 (초)
     
     # 재시도 설정
-    MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))  # 최대 재시도 횟수
-    RETRY_DELAY = float(os.getenv('RETRY_DELAY', '1.0'))  # 재시도 간 지연 시간 (초)
+    MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))  # 단계별 최대 시도 횟수
+    RETRY_DELAY = float(os.getenv('RETRY_DELAY', '1.0'))  # 재시도 기본 지연 시간 (초, 재시도마다 2배)
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '5.0'))  # 재시도 최대 지연 시간 (초)
+    RETRY_BUDGET = int(os.getenv('RETRY_BUDGET', str(MAX_RETRIES)))  # 링크 하나당 전체 단계 합산 재시도 횟수
     
-    # 페이지 로딩 대기 시간
+    # 버튼 클릭 후 카카오톡 창이 뜰 때까지 최대 대기 시간 (화면 변화가 감지되면 바로 진행)
     PAGE_LOAD_WAIT = float(os.getenv('PAGE_LOAD_WAIT', '2.5'))
     
+    # 참여 대기열 (메시지 수신 후 이 시간(초)이 지난 링크는 버림, 0이면 제한 없음)
+    JOIN_MAX_AGE = int(os.getenv('JOIN_MAX_AGE', '120'))
+    # 채팅방별 우선순위 (채팅방ID:초, 쉼표로 구분) - 해당 채팅방 메시지를 지정한 초만큼 더 최신으로 취급
+    CHAT_PRIORITIES = os.getenv('CHAT_PRIORITIES', '')
+    
+    # 링크 중복 제거 (참여한 방을 다시 처리하지 않는 시간, 처리 중 표시 유지 시간)
+    LINK_DEDUPE_TTL = int(os.getenv('LINK_DEDUPE_TTL', '21600'))
+    # 참여 성공을 확인하지 못한 방을 같은 비밀번호로 다시 시도하지 않는 시간 (다른 비밀번호가 오면 바로 재시도)
+    LINK_ATTEMPT_TTL = int(os.getenv('LINK_ATTEMPT_TTL', '1800'))
+    # 참여 불가(인원 초과, 비밀번호 오류 등)로 판정된 방을 같은 비밀번호로 다시 시도하지 않는 시간
+    LINK_FAILED_TTL = int(os.getenv('LINK_FAILED_TTL', '3600'))
+    LINK_INFLIGHT_TTL = int(os.getenv('LINK_INFLIGHT_TTL', str(JOIN_MAX_AGE + URL_TIMEOUT)))
+    
+    # 사용자 계정과 봇이 같은 메시지를 함께 받을 때 한 번만 처리하기 위해 기억하는 (채팅방, 메시지) 수와 시간 (초)
+    UPDATE_DEDUPE_SIZE = int(os.getenv('UPDATE_DEDUPE_SIZE', '10000'))
+    UPDATE_DEDUPE_TTL = int(os.getenv('UPDATE_DEDUPE_TTL', '600'))
+    
+    # 재연결/재시작 후 놓친 메시지 백필 (채팅방별 마지막 처리 메시지 ID를 MESSAGE_CACHE_DB에 저장)
+    CATCHUP_CONCURRENCY = int(os.getenv('CATCHUP_CONCURRENCY', '3'))  # 동시에 조회할 채팅방 수
+    CATCHUP_LIMIT = int(os.getenv('CATCHUP_LIMIT', '50'))  # 채팅방별 최대 백필 메시지 수
+    CATCHUP_MAX_AGE = int(os.getenv('CATCHUP_MAX_AGE', '1800'))  # 이보다 오래된 메시지는 가져오지 않음 (초)
+    CATCHUP_ACTIVE_TTL = int(os.getenv('CATCHUP_ACTIVE_TTL', '86400'))  # 이 시간 안에 메시지가 있었던 채팅방만 백필 (초)
+    CATCHUP_WATCH_INTERVAL = float(os.getenv('CATCHUP_WATCH_INTERVAL', '1'))  # 감시 클라이언트 연결 상태 확인 간격 (초)
+    
     # 운영체제별 설정
     SYSTEM = platform.system()
     
@@ -127,8 +205,20 @@ class Config:
     # 비밀번호가 있는 경우 사용할 좌표
     PASSWORD_CLICK_COORDINATES = [(1994, 606), (1915,425), (2115, 358), (2004, 510)]
     
-    # 클릭 간격
+    # 버튼 이미지 템플릿 매칭 (템플릿이 없거나 찾지 못하면 위 좌표 사용)
+    # TEMPLATE_DIR에 normal_1.png, normal_2.png ... / password_1.png ... 형식으로 단계별 버튼 이미지를 저장
+    TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", "templates")
+    TEMPLATE_SCALES = [float(s) for s in os.getenv("TEMPLATE_SCALES", "1.0").split(",") if s.strip()]
+    TEMPLATE_MATCH_THRESHOLD = float(os.getenv("TEMPLATE_MATCH_THRESHOLD", "0.8"))
+    TEMPLATE_SEARCH_MARGIN = int(os.getenv("TEMPLATE_SEARCH_MARGIN", "300"))  # 예상 위치 주변 탐색 범위 (픽셀)
+    # 참여 결과 확인 (TEMPLATE_DIR/outcomes에 success_*.png, terminal_*.png, retry_*.png 형식으로 결과 화면 저장)
+    JOIN_VERIFY_TIMEOUT = float(os.getenv("JOIN_VERIFY_TIMEOUT", "3.0"))
+    
+    # 클릭 후 화면 반응을 기다리는 최대 시간 (반응이 감지되면 바로 다음 단계 진행)
     CLICK_INTERVAL = float(os.getenv('CLICK_INTERVAL', '0.2'))
+    # 클립보드 복사 확인, 붙여넣기 반영 최대 대기 시간
+    CLIPBOARD_WAIT = float(os.getenv('CLIPBOARD_WAIT', '0.2'))
+    PASTE_WAIT = float(os.getenv('PASTE_WAIT', '0.3'))
     
     # 디버그 파일 설정
     DEBUG_FILES_MAX_AGE_DAYS = int(os.getenv('DEBUG_FILES_MAX_AGE_DAYS', '7'))
@@ -165,7 +255,8 @@ class Config:
         # 옵션 환경변수 로깅
         logging.info(f"API_ID: {cls.API_ID}")
         logging.info(f"TARGET_GROUP: {cls.TARGET_GROUP}")
-        logging.info(f"KEYWORD: {cls.KEYWORD}")
+        logging.info(f"NOTIFY_ROUTES: {cls.NOTIFY_ROUTES or '없음 (TARGET_GROUP으로 전송)'}")
+        logging.info(f"KEYWORDS: {cls.KEYWORDS} (대소문자 {'무시' if cls.KEYWORD_CASE_INSENSITIVE else '구분'})")
         logging.info(f"CLOVA OCR API URL: {cls.CLOVA_OCR_API_URL}")
         logging.info(f"CLOVA OCR Secret Key: {'설정됨' if cls.CLOVA_OCR_SECRET_KEY else '설정되지 않음'}")
         logging.info(f"디버그 모드: {'활성화' if cls.DEBUG_MODE else '비활성화'}")
@@ -176,6 +267,9 @@ class Config:
         logging.info(f"이미지 디렉토리: {cls.IMAGE_DIR}")
         logging.info(f"최대 이미지 크기: {cls.MAX_IMAGE_DIMENSION}")
         logging.info(f"작업자 수: {cls.NUM_WORKERS}")
+        logging.info(f"JOIN_MAX_AGE: {cls.JOIN_MAX_AGE}초, CHAT_PRIORITIES: {cls.CHAT_PRIORITIES or '없음'}")
+        logging.info(f"백필: 최근 {cls.CATCHUP_MAX_AGE}초, 채팅방당 {cls.CATCHUP_LIMIT}개, 동시 {cls.CATCHUP_CONCURRENCY}개")
+        logging.info(f"브라우저 풀: 기본 {cls.BROWSER_POOL_SIZE}개, 최대 {cls.BROWSER_POOL_MAX}개")
         
         # 이미지 디렉토리 생성
         os.makedirs(cls.IMAGE_DIR, exist_ok=True)
@@ -207,36 +301,347 @@ def cleanup_debug_files(max_age_days=None):
     if file_count > 0:
         logging.info(f"오래된 디버그 파일 {file_count}개 삭제 완료")
 
-def timeout_handler(signum, frame):
-    """타임아웃 발생 시 호출되는 핸들러"""
-    raise TimeoutError("Operation timed out")
+def wait_until(condition, timeout, interval=0.05, budget=None):
+    """
+    condition()이 참이 될 때까지 최대 timeout초 대기. (충족 여부, 대기한 시간) 반환
+    budget이 있으면 남은 작업 시간 안에서만 기다리고, 작업이 취소되면 JobCancelledError 발생
+    """
+    if budget is not None:
+        timeout = min(timeout, budget.remaining())
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        if budget is not None:
+            budget.check('wait')
+        try:
+            if condition():
+                return True, time.monotonic() - start
+        except Exception as e:
+            logging.debug(f"대기 조건 확인 중 오류: {e}")
+        if time.monotonic() >= deadline:
+            return False, time.monotonic() - start
+        time.sleep(interval)
 
+class RetryBudgetExceeded(Exception):
+    """링크 하나에 허용된 재시도 횟수 또는 시간(URL_TIMEOUT)을 모두 사용함"""
+
+
+class JobCancelledError(RetryBudgetExceeded):
+    """작업 시간이 끝났거나 asyncio 쪽에서 작업을 취소함"""
+
+
+class RetryBudget:
+    """
+    링크 하나의 참여 작업 전체가 공유하는 재시도 정책
+    
+    탐색/버튼 클릭/좌표 클릭/전체 재시도 단계가 각각 따로 재시도하지 않고 하나의 예산을 나눠 쓴다.
+    전체 재시도 횟수(RETRY_BUDGET), 단계별 시도 횟수(MAX_RETRIES), 작업 시간(URL_TIMEOUT)을 넘으면
+    RetryBudgetExceeded를 발생시켜, asyncio 쪽 타임아웃 이후에도 실행자 스레드가 브라우저를 붙잡지 않도록 한다.
+    
+    작업의 취소 토큰도 겸한다. 스레드는 Selenium/pyautogui 단계마다 check()로 취소 여부를 확인하고,
+    asyncio 쪽은 타임아웃 시 cancel()을 호출한다.
+    """
+    def __init__(self, max_retries=None, timeout=None, stage_attempts=None, base_delay=None, max_delay=None):
+        self.max_retries = Config.RETRY_BUDGET if max_retries is None else max_retries
+        self.stage_attempts = Config.MAX_RETRIES if stage_attempts is None else stage_attempts
+        self.base_delay = Config.RETRY_DELAY if base_delay is None else base_delay
+        self.max_delay = Config.RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + (Config.URL_TIMEOUT if timeout is None else timeout)
+        self.retries = 0
+        self.attempts = {}  # 단계 -> 시도 횟수
+        self.failures = {}  # 단계 -> 실패 횟수
+        self.cancelled = threading.Event()
+    
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def timeout(self, limit):
+        """단계별 타임아웃을 남은 작업 시간으로 제한 (최소 1초)"""
+        return max(1.0, min(limit, self.remaining()))
+    
+    def cancel(self):
+        self.cancelled.set()
+    
+    def check(self, stage):
+        """취소되었거나 작업 시간이 끝났으면 JobCancelledError"""
+        if self.cancelled.is_set():
+            raise JobCancelledError(f"{stage}: 작업 취소됨")
+        if self.remaining() <= 0:
+            raise JobCancelledError(f"{stage}: 작업 시간 초과")
+    
+    @contextmanager
+    def hold(self, lock, stage, interval=0.1):
+        """남은 작업 시간 안에서 lock을 획득해 유지. 기다리는 동안 취소되거나 시간이 끝나면 JobCancelledError"""
+        while not lock.acquire(timeout=min(interval, self.remaining())):
+            self.check(stage)
+        try:
+            yield
+        finally:
+            lock.release()
+    
+    def attempt(self, stage):
+        """단계 시도 기록. 취소되었거나 작업 시간이 끝났으면 JobCancelledError"""
+        self.check(stage)
+        self.attempts[stage] = self.attempts.get(stage, 0) + 1
+    
+    def retry(self, stage, error):
+        """
+        단계 실패 기록 후 재시도 가능하면 지터가 적용된 지수 백오프만큼 대기, 불가능하면 RetryBudgetExceeded
+        """
+        if isinstance(error, JobCancelledError):
+            raise error
+        self.check(stage)
+        self.failures[stage] = self.failures.get(stage, 0) + 1
+        if self.attempts.get(stage, 0) >= self.stage_attempts:
+            raise RetryBudgetExceeded(f"{stage}: 단계 최대 시도 횟수 도달 ({error})") from error
+        if self.retries >= self.max_retries:
+            raise RetryBudgetExceeded(f"{stage}: 재시도 예산 소진 ({error})") from error
+        
+        delay = min(self.max_delay, self.base_delay * (2 ** self.retries))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        if delay >= self.remaining():
+            raise RetryBudgetExceeded(f"{stage}: 남은 작업 시간 부족 ({error})") from error
+        
+        self.retries += 1
+        logging.warning(f"{stage} 실패, {delay:.2f}초 후 재시도 "
+                        f"(재시도 {self.retries}/{self.max_retries}, 남은 시간 {self.remaining():.1f}초): {error}")
+        if self.cancelled.wait(delay):
+            raise JobCancelledError(f"{stage}: 재시도 대기 중 작업 취소됨") from error
+    
+    def report(self):
+        """단계별 (시도, 실패) 횟수와 사용 시간"""
+        stages = {stage: (count, self.failures.get(stage, 0)) for stage, count in self.attempts.items()}
+        return f"단계별 (시도, 실패) {stages}, 재시도 {self.retries}/{self.max_retries}, " \
+               f"{time.monotonic() - self.started_at:.1f}초"
+
+class ScreenLocator:
+    """
+    카카오톡 참여 화면의 버튼 위치 탐색기
+    
+    단계별 버튼 템플릿을 시작 시 한 번 읽어 배율별로 미리 축소/확대해 두고,
+    예상 위치 주변의 제한된 영역만 캡처해 cv2.matchTemplate으로 찾는다.
+    찾은 위치와 설정 좌표의 차이(창 이동량)를 기억해 다음 단계와 다음 작업의 탐색 중심으로 사용하며,
+    템플릿이 없거나 찾지 못하면 설정 좌표(+창 이동량)를 그대로 사용한다.
+    """
+    KINDS = ('normal', 'password')
+    
+    def __init__(self, template_dir=None, scales=None, threshold=None, margin=None):
+        self.template_dir = template_dir or Config.TEMPLATE_DIR
+        self.scales = scales or Config.TEMPLATE_SCALES
+        self.threshold = Config.TEMPLATE_MATCH_THRESHOLD if threshold is None else threshold
+        self.margin = Config.TEMPLATE_SEARCH_MARGIN if margin is None else margin
+        self.offset = (0, 0)  # 설정 좌표 대비 창 이동량
+        self.templates = self._load_templates()
+        
+        # 통계
+        self.matches = 0
+        self.fallbacks = 0
+        self.total_ms = 0.0
+    
+    def _load_templates(self):
+        """{(종류, 단계): [(배율 적용 템플릿, 높이, 너비), ...]}"""
+        templates = {}
+        if not os.path.isdir(self.template_dir):
+            logging.info(f"템플릿 디렉토리 없음, 설정 좌표만 사용: {self.template_dir}")
+            return templates
+        
+        for kind in self.KINDS:
+            step = 1
+            while True:
+                path = os.path.join(self.template_dir, f"{kind}_{step}.png")
+                if not os.path.exists(path):
+                    break
+                scaled = self.load_template(path, self.scales)
+                if scaled:
+                    templates[(kind, step - 1)] = scaled
+                step += 1
+        
+        logging.info(f"버튼 템플릿 {len(templates)}개 로드 (배율: {self.scales})")
+        return templates
+    
+    @staticmethod
+    def load_template(path, scales):
+        """템플릿을 흑백으로 읽어 배율별로 미리 변환 [(템플릿, 높이, 너비), ...]"""
+        template = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if template is None:
+            logging.warning(f"템플릿 이미지 읽기 실패: {path}")
+            return []
+        scaled = []
+        for scale in scales:
+            resized = template if scale == 1.0 else cv2.resize(
+                template, None, fx=scale, fy=scale,
+                interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            )
+            scaled.append((resized, resized.shape[0], resized.shape[1]))
+        return scaled
+    
+    @staticmethod
+    def best_match(screen, scaled_templates):
+        """배율별 템플릿 중 가장 유사한 위치 (유사도, 중심 좌표) 반환. 비교할 수 없으면 (-1.0, None)"""
+        best_score, best_center = -1.0, None
+        for template, height, width in scaled_templates:
+            if height > screen.shape[0] or width > screen.shape[1]:
+                continue
+            result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, location = cv2.minMaxLoc(result)
+            if score > best_score:
+                best_score = score
+                best_center = (location[0] + width / 2, location[1] + height / 2)
+        return best_score, best_center
+    
+    def capture(self, center):
+        """예상 위치 주변 영역을 흑백으로 캡처해 (영역, 이미지, 캡처 배율) 반환"""
+        region = self._search_region(center, pyautogui.size())
+        screen = cv2.cvtColor(np.asarray(pyautogui.screenshot(region=region)), cv2.COLOR_RGB2GRAY)
+        # 고해상도(레티나) 화면은 캡처 픽셀 수가 좌표계보다 클 수 있음
+        ratio = screen.shape[1] / region[2] if region[2] else 1.0
+        return region, screen, ratio
+    
+    def expected(self, point):
+        """설정 좌표에 창 이동량을 반영한 예상 위치"""
+        return (point[0] + self.offset[0], point[1] + self.offset[1])
+    
+    def _search_region(self, center, screen_size):
+        screen_width, screen_height = screen_size
+        left = max(0, center[0] - self.margin)
+        top = max(0, center[1] - self.margin)
+        right = min(screen_width, center[0] + self.margin)
+        bottom = min(screen_height, center[1] + self.margin)
+        return (left, top, right - left, bottom - top)
+    
+    def locate(self, kind, step, point):
+        """단계별 클릭 좌표 반환 (템플릿 매칭 성공 시 찾은 버튼 중심, 실패 시 설정 좌표 + 창 이동량)"""
+        expected = self.expected(point)
+        scaled_templates = self.templates.get((kind, step))
+        if not scaled_templates:
+            return expected
+        
+        start = time.perf_counter()
+        try:
+            region, screen, ratio = self.capture(expected)
+            best_score, best_center = self.best_match(screen, scaled_templates)
+        except Exception as e:
+            logging.warning(f"템플릿 매칭 실패 ({kind} 단계 {step + 1}): {e}")
+            best_score, best_center = -1.0, None
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.total_ms += elapsed_ms
+        
+        if best_center is None or best_score < self.threshold:
+            self.fallbacks += 1
+            logging.info(f"버튼을 찾지 못해 설정 좌표 사용 ({kind} 단계 {step + 1}, "
+                         f"유사도 {best_score:.2f}, {elapsed_ms:.0f}ms): {expected}")
+            return expected
+        
+        found = (int(region[0] + best_center[0] / ratio), int(region[1] + best_center[1] / ratio))
+        self.offset = (found[0] - point[0], found[1] - point[1])
+        self.matches += 1
+        logging.info(f"버튼 위치 탐색 ({kind} 단계 {step + 1}, 유사도 {best_score:.2f}, "
+                     f"{elapsed_ms:.0f}ms): {found}, 창 이동량 {self.offset}")
+        return found
+    
+    def stats(self):
+        lookups = self.matches + self.fallbacks
+        return {
+            'templates': len(self.templates),
+            'matches': self.matches,
+            'fallbacks': self.fallbacks,
+            'offset': self.offset,
+            'avg_ms': round(self.total_ms / lookups, 1) if lookups else 0,
+        }
+
+class JoinFailedError(Exception):
+    """재시도해도 소용없는 참여 실패 (방 인원 초과, 비밀번호 오류 등)"""
 
-def with_timeout(seconds):
-    """함수에 타임아웃을 적용하는 데코레이터"""
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            # Windows에서는 signal.SIGALRM이 지원되지 않으므로 단순히 함수 호출
-            if platform.system() == 'Windows':
-                return func(*args, **kwargs)
-            
-            # Linux/Mac에서는 signal 사용
-            signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(seconds)
-            try:
-                result = func(*args, **kwargs)
-                signal.alarm(0)  # 타임아웃 해제
-                return result
-            except TimeoutError as e:
-                logging.error(f"Function {func.__name__} timed out after {seconds} seconds")
-                raise
-            finally:
-                signal.alarm(0)  # 타임아웃 해제 (필수)
-        return wrapper
-    return decorator
+
+class JoinRetryableError(Exception):
+    """다시 시도하면 성공할 수 있는 참여 실패 (일시적 오류 화면 등)"""
+
+
+class JoinVerifier:
+    """
+    클릭 후 화면으로 참여 결과 판정
+    
+    TEMPLATE_DIR/outcomes의 결과 화면 템플릿(파일명 접두사가 판정: success_, terminal_, retry_)을
+    카카오톡 창 주변에서 찾아 성공/재시도 불가 실패/재시도 가능 실패로 분류한다.
+    템플릿이 없거나 시간 안에 어떤 결과 화면도 보이지 않으면 판정하지 않는다 (참여 여부 미확인).
+    """
+    OUTCOMES = ('success', 'terminal', 'retry')
+    
+    def __init__(self, locator, timeout=None):
+        self.locator = locator
+        self.timeout = Config.JOIN_VERIFY_TIMEOUT if timeout is None else timeout
+        self.templates = self._load_templates()  # [(판정, 이름, 배율별 템플릿), ...]
+        self.counts = dict.fromkeys(self.OUTCOMES + ('unknown',), 0)
+    
+    def _load_templates(self):
+        templates = []
+        outcome_dir = os.path.join(self.locator.template_dir, "outcomes")
+        if not os.path.isdir(outcome_dir):
+            return templates
+        for filename in sorted(os.listdir(outcome_dir)):
+            name, ext = os.path.splitext(filename)
+            outcome = name.split('_', 1)[0]
+            if ext.lower() != '.png' or outcome not in self.OUTCOMES:
+                continue
+            scaled = ScreenLocator.load_template(os.path.join(outcome_dir, filename), self.locator.scales)
+            if scaled:
+                templates.append((outcome, name, scaled))
+        logging.info(f"참여 결과 템플릿 {len(templates)}개 로드")
+        return templates
+    
+    def classify(self, screen):
+        """가장 유사한 결과 템플릿의 (판정, 이름) 반환. 임계값 미만이면 None"""
+        best = None
+        best_score = self.locator.threshold
+        for outcome, name, scaled in self.templates:
+            score, _ = ScreenLocator.best_match(screen, scaled)
+            if score >= best_score:
+                best, best_score = (outcome, name), score
+        return best
+    
+    def verify(self, point, budget=None):
+        """결과 화면이 나타날 때까지 기다려 판정. success는 반환, 실패는 예외 발생"""
+        if not self.templates:
+            return None
+        
+        result = {}
+        
+        def condition():
+            _, screen, _ = self.locator.capture(self.locator.expected(point))
+            result['outcome'] = self.classify(screen)
+            return result['outcome'] is not None
+        
+        found, elapsed = wait_until(condition, self.timeout, 0.1, budget)
+        if not found:
+            self.counts['unknown'] += 1
+            logging.info(f"참여 결과 화면을 확인하지 못함 ({elapsed:.2f}s), 판정 보류")
+            return None
+        
+        outcome, name = result['outcome']
+        self.counts[outcome] += 1
+        logging.info(f"참여 결과 판정: {outcome} ({name}, {elapsed:.2f}s)")
+        if outcome == 'terminal':
+            raise JoinFailedError(name)
+        if outcome == 'retry':
+            raise JoinRetryableError(name)
+        return outcome
+    
+    def stats(self):
+        return dict(self.counts)
 
 class WebDriver:
+    # pyautogui 클릭은 화면(카카오톡 창) 하나를 공유하므로 브라우저가 여러 개여도 직렬화
+    desktop_lock = threading.Lock()
+    # 버튼 위치 탐색기 (창 이동량을 작업 간에 공유하므로 모든 브라우저가 같이 사용)
+    locator = None
+    verifier = None
+    
+    # 화면 변화 감지 영역 반경 (픽셀)과 변화로 판단할 평균 픽셀 차이
+    WATCH_RADIUS = 40
+    CHANGE_THRESHOLD = 2.0
+    
     def __init__(self):
         options = Options()
         options.add_argument('--no-sandbox')
@@ -269,50 +674,94 @@ class WebDriver:
             raise
                 
         self.driver.set_page_load_timeout(Config.NAVIGATION_TIMEOUT)
+        self.wait_saved = 0.0  # 현재 참여 작업에서 고정 대기 대비 절약한 시간 (초)
+        with WebDriver.desktop_lock:
+            if WebDriver.locator is None:
+                WebDriver.locator = ScreenLocator()
+                WebDriver.verifier = JoinVerifier(WebDriver.locator)
         logging.info(f"ChromeDriver 초기화 완료 ({Config.SYSTEM})")
 
-    def navigate(self, url):
-        retry_count = 0
-        while retry_count < Config.MAX_RETRIES:
+    def navigate(self, url, budget=None):
+        budget = budget or RetryBudget()
+        while True:
+            budget.attempt('navigate')
             try:
+                # 페이지 로드가 남은 작업 시간을 넘기지 않도록 Selenium 타임아웃 조정
+                self.driver.set_page_load_timeout(budget.timeout(Config.NAVIGATION_TIMEOUT))
                 self.driver.get(url)
+                budget.check('navigate')
                 # 명시적 대기를 사용하여 페이지 로드 완료 확인
-                WebDriverWait(self.driver, Config.NAVIGATION_TIMEOUT).until(
+                WebDriverWait(self.driver, budget.timeout(Config.NAVIGATION_TIMEOUT)).until(
                     lambda d: d.execute_script('return document.readyState') == 'complete'
                 )
                 logging.info(f"Successfully navigated to {url}")
                 return True
             except Exception as e:
-                retry_count += 1
-                logging.warning(f"Failed to navigate to {url} (Attempt {retry_count}/{Config.MAX_RETRIES}): {e}")
-                if retry_count >= Config.MAX_RETRIES:
-                    logging.error(f"Maximum retries reached for navigation to {url}")
-                    raise
-                time.sleep(Config.RETRY_DELAY)
-
-    def click_button(self):
-        retry_count = 0
-        while retry_count < Config.MAX_RETRIES:
+                logging.warning(f"Failed to navigate to {url}: {e}")
+                budget.retry('navigate', e)
+
+    def _watch_region(self, x, y):
+        """좌표 주변 감시 영역 (left, top, width, height)"""
+        screen_width, screen_height = pyautogui.size()
+        r = self.WATCH_RADIUS
+        left = max(0, min(x - r, screen_width - 2 * r))
+        top = max(0, min(y - r, screen_height - 2 * r))
+        return (left, top, 2 * r, 2 * r)
+    
+    def _grab(self, region):
+        return np.asarray(pyautogui.screenshot(region=region), dtype=np.int16)
+    
+    def _changed(self, before, after):
+        return before.shape != after.shape or np.abs(after - before).mean() > self.CHANGE_THRESHOLD
+    
+    def _record_wait(self, label, limit, ok, elapsed):
+        """조건 대기 결과 기록 (고정 대기 시간 대비 절약분 누적)"""
+        self.wait_saved += max(0.0, limit - elapsed)
+        logging.debug(f"{label}: {'조건 충족' if ok else '최대 대기 도달'} {elapsed:.2f}s / {limit:.2f}s")
+    
+    def _wait_screen_change(self, region, baseline, timeout, label, settle=False, budget=None):
+        """
+        감시 영역이 baseline과 달라질 때까지 대기. settle이면 변화 후 화면이 멈출 때까지(창 애니메이션 종료) 대기
+        """
+        state = {'previous': None}
+        
+        def condition():
+            current = self._grab(region)
+            previous, state['previous'] = state['previous'], current
+            if not self._changed(baseline, current):
+                return False
+            return not settle or (previous is not None and not self._changed(previous, current))
+        
+        ok, elapsed = wait_until(condition, timeout, budget=budget)
+        self._record_wait(label, timeout, ok, elapsed)
+        return ok
+    
+    def click_button(self, budget=None):
+        budget = budget or RetryBudget()
+        while True:
+            budget.attempt('click_button')
             try:
                 # 명시적 대기를 사용하여 버튼이 클릭 가능한 상태가 될 때까지 대기
-                button = WebDriverWait(self.driver, Config.CLICK_TIMEOUT).until(
+                button = WebDriverWait(self.driver, budget.timeout(Config.CLICK_TIMEOUT)).until(
                     EC.element_to_be_clickable((By.CSS_SELECTOR, 'button'))
                 )
+                # 카카오톡 창이 뜨는 위치(첫 클릭 좌표)의 화면 변화로 창 표시 완료 판단
+                region = self._watch_region(*self.locator.expected(Config.CLICK_COORDINATES[0]))
+                baseline = self._grab(region)
+                budget.check('click_button')
                 button.click()
-                time.sleep(Config.PAGE_LOAD_WAIT)
+                self._wait_screen_change(region, baseline, Config.PAGE_LOAD_WAIT, "카카오톡 창 표시",
+                                         settle=True, budget=budget)
                 logging.info("Button clicked successfully")
                 return True
             except Exception as e:
-                retry_count += 1
-                logging.warning(f"Failed to click button (Attempt {retry_count}/{Config.MAX_RETRIES}): {e}")
-                if retry_count >= Config.MAX_RETRIES:
-                    logging.error("Maximum retries reached for button click")
-                    raise
-                time.sleep(Config.RETRY_DELAY)
-
-    def perform_clicks(self, password=None):
-        retry_count = 0
-        while retry_count < Config.MAX_RETRIES:
+                logging.warning(f"Failed to click button: {e}")
+                budget.retry('click_button', e)
+
+    def perform_clicks(self, password=None, budget=None):
+        budget = budget or RetryBudget()
+        while True:
+            budget.attempt('perform_clicks')
             try:
                 # 현재 화면 크기 확인
                 screen_width, screen_height = pyautogui.size()
@@ -320,14 +769,21 @@ class WebDriver:
                 
                 # 비밀번호 유무에 따라 다른 좌표를 사용
                 coordinates = Config.PASSWORD_CLICK_COORDINATES if password else Config.CLICK_COORDINATES
+                kind = 'password' if password else 'normal'
                 logging.info(f"사용할 좌표: {'비밀번호용' if password else '일반'} 좌표셋")
                 
-                for i, (x, y) in enumerate(coordinates):
+                for i, point in enumerate(coordinates):
+                    # 버튼 이미지로 실제 위치를 찾고, 못 찾으면 설정 좌표 사용
+                    x, y = self.locator.locate(kind, i, point)
+                    
                     # 화면 밖으로 나가지 않도록 좌표 조정
                     safe_x = min(x, screen_width - 10)
                     safe_y = min(y, screen_height - 10)
+                    region = self._watch_region(safe_x, safe_y)
+                    baseline = self._grab(region)
                     
-                    pyautogui.moveTo(safe_x, safe_y, duration=0.1)
+                    budget.check('perform_clicks')
+                    pyautogui.moveTo(safe_x, safe_y)
                     pyautogui.click()
                     logging.info(f"좌표 클릭 완료: ({safe_x}, {safe_y}) - 단계 {i+1}/{len(coordinates)}")
                     
@@ -335,23 +791,49 @@ class WebDriver:
                     if password and i == 0:
                         logging.info(f"비밀번호 입력 시작: {password}")
                         pyperclip.copy(password)
-                        time.sleep(0.2)
+                        ok, elapsed = wait_until(lambda: pyperclip.paste() == password, Config.CLIPBOARD_WAIT,
+                                                 0.01, budget)
+                        self._record_wait("클립보드 복사 확인", Config.CLIPBOARD_WAIT, ok, elapsed)
+                        
+                        pasted_baseline = self._grab(region)
+                        budget.check('perform_clicks')
                         pyautogui.hotkey('ctrl', 'v')
                         logging.info("비밀번호 붙여넣기 완료")
-                        time.sleep(0.3)
+                        self._wait_screen_change(region, pasted_baseline, Config.PASTE_WAIT, "비밀번호 입력 반영",
+                                                 budget=budget)
                         # 엔터키는 비밀번호 붙여넣기 후에 누르지 않고 다음 좌표 이동
-                    
-                    time.sleep(Config.CLICK_INTERVAL)
+                    else:
+                        # 클릭한 위치의 화면이 반응하면 다음 좌표로 진행
+                        self._wait_screen_change(region, baseline, Config.CLICK_INTERVAL, f"클릭 반응 (단계 {i+1})",
+                                                 budget=budget)
                 
                 logging.info(f"모든 클릭 작업 완료 - 비밀번호: {'있음' if password else '없음'}")
                 return True
             except Exception as e:
-                retry_count += 1
-                logging.warning(f"클릭 작업 실패 (시도 {retry_count}/{Config.MAX_RETRIES}): {e}")
-                if retry_count >= Config.MAX_RETRIES:
-                    logging.error("최대 재시도 횟수 도달")
-                    raise
-                time.sleep(Config.RETRY_DELAY)
+                logging.warning(f"클릭 작업 실패: {e}")
+                budget.retry('perform_clicks', e)
+
+    def reset(self, timeout=None):
+        """중단된 작업의 페이지를 비우고 타임아웃 설정 복구. 제한 시간 안에 응답하지 않으면 False"""
+        timeout = Config.BROWSER_RESET_TIMEOUT if timeout is None else timeout
+        try:
+            self.driver.set_page_load_timeout(timeout)
+            self.driver.get('about:blank')
+            self.driver.set_page_load_timeout(Config.NAVIGATION_TIMEOUT)
+            logging.info("중단된 작업의 브라우저 초기화 완료")
+            return True
+        except Exception as e:
+            logging.warning(f"브라우저 초기화 실패: {e}")
+            return False
+    
+    def is_alive(self):
+        """브라우저 세션이 응답하는지 확인"""
+        try:
+            self.driver.execute_script('return 1')
+            return True
+        except Exception as e:
+            logging.warning(f"WebDriver 상태 점검 실패: {e}")
+            return False
 
     def quit(self):
         try:
@@ -360,7 +842,354 @@ class WebDriver:
         except Exception as e:
             logging.error(f"Failed to quit WebDriver: {e}")
 
+class WebDriverPool:
+    """
+    독립 WebDriver 인스턴스 풀
+    
+    사전 실행된 브라우저를 작업마다 체크아웃/체크인하고, 체크아웃 시 상태를 점검하며,
+    대기 중인 작업 수에 맞춰 최대 크기까지 늘렸다가 유휴 인스턴스는 기본 크기로 줄인다.
+    """
+    def __init__(self, size=None, max_size=None, idle_timeout=None, factory=WebDriver):
+        self.size = max(1, size if size is not None else Config.BROWSER_POOL_SIZE)
+        self.max_size = max(self.size, max_size if max_size is not None else Config.BROWSER_POOL_MAX)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else Config.BROWSER_IDLE_TIMEOUT
+        self.factory = factory
+        
+        self._cond = threading.Condition()
+        self._idle = deque()  # (driver, 마지막 사용 시각)
+        self._total = 0       # 생성 완료된 인스턴스 수
+        self._creating = 0    # 생성 중인 인스턴스 수
+        self._waiting = 0     # 체크아웃 대기 중인 작업 수
+        self._closed = False
+
+    def start(self):
+        """기본 크기만큼 브라우저를 미리 실행"""
+        for _ in range(self.size):
+            with self._cond:
+                self._creating += 1
+            self._spawn()
+        logging.info(f"브라우저 풀 시작: {self.stats()}")
+
+    def _spawn(self):
+        """새 인스턴스를 생성해 유휴 목록에 추가 (_creating은 호출자가 미리 증가)"""
+        try:
+            driver = self.factory()
+        except Exception as e:
+            logging.error(f"브라우저 풀 인스턴스 생성 실패: {e}")
+            with self._cond:
+                self._creating -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._creating -= 1
+            self._total += 1
+            if self._closed:
+                self._total -= 1
+                closed = True
+            else:
+                self._idle.append((driver, time.monotonic()))
+                self._cond.notify()
+                closed = False
+        if closed:
+            driver.quit()
+        return driver
+
+    def _spawn_background(self):
+        try:
+            self._spawn()
+        except Exception:
+            pass  # _spawn에서 이미 로깅됨
+
+    def ensure_capacity(self, demand):
+        """
+        브라우저가 필요한 작업 수(demand, 실행 중인 작업 포함)에 맞춰 최대 크기 내에서 브라우저를 미리 띄움
+        """
+        with self._cond:
+            if self._closed:
+                return
+            available = len(self._idle) + self._creating
+            busy = self._total - len(self._idle)
+            target = min(self.max_size, demand)
+            to_create = min(target - busy - available, self.max_size - self._total - self._creating)
+            if to_create <= 0:
+                return
+            self._creating += to_create
+        logging.info(f"대기 작업 {demand}개에 맞춰 브라우저 {to_create}개 추가 실행")
+        for _ in range(to_create):
+            threading.Thread(target=self._spawn_background, daemon=True).start()
+
+    def acquire(self, timeout=None):
+        """유휴 브라우저를 체크아웃 (없으면 최대 크기까지 생성하거나 반환될 때까지 대기)"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            driver = None
+            spawn = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("브라우저 풀이 종료되었습니다.")
+                    if self._idle:
+                        driver, _ = self._idle.pop()  # 최근 사용 인스턴스 우선 (LIFO)
+                        break
+                    if self._total + self._creating < self.max_size:
+                        self._creating += 1
+                        spawn = True
+                        break
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("브라우저 풀 체크아웃 타임아웃")
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+            
+            if spawn:
+                self._spawn()
+                continue  # 생성된 인스턴스는 유휴 목록을 거쳐 체크아웃
+            
+            if driver.is_alive():
+                return driver
+            
+            # 응답 없는 인스턴스는 폐기하고 다시 시도
+            self._discard(driver)
+
+    def release(self, driver):
+        """브라우저를 풀에 반환"""
+        with self._cond:
+            if self._closed:
+                self._total -= 1
+                closed = True
+            else:
+                self._idle.append((driver, time.monotonic()))
+                self._cond.notify()
+                closed = False
+        if closed:
+            driver.quit()
+        else:
+            self._reap_idle()
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        driver = self.acquire(timeout)
+        healthy = True
+        try:
+            yield driver
+        except RetryBudgetExceeded:
+            # 중단된 작업의 브라우저는 초기화해 반환하고, 초기화에 실패하면 폐기 (필요 시 새로 생성)
+            healthy = driver.reset()
+            raise
+        finally:
+            if healthy:
+                self.release(driver)
+            else:
+                self._discard(driver)
+
+    def _discard(self, driver):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        logging.warning("응답 없는 브라우저 인스턴스 폐기")
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"브라우저 인스턴스 종료 실패: {e}")
+
+    def _reap_idle(self):
+        """기본 크기를 넘는 오래된 유휴 인스턴스 정리"""
+        expired = []
+        now = time.monotonic()
+        with self._cond:
+            # 가장 오래 쉰 인스턴스는 deque 앞쪽에 있음
+            while (self._idle and self._total > self.size and
+                   now - self._idle[0][1] > self.idle_timeout):
+                driver, _ = self._idle.popleft()
+                self._total -= 1
+                expired.append(driver)
+        for driver in expired:
+            logging.info("유휴 브라우저 인스턴스 정리")
+            driver.quit()
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'total': self._total,
+                'idle': idle,
+                'busy': self._total - idle,
+                'creating': self._creating,
+                'waiting': self._waiting,
+            }
+
+    def close(self):
+        """유휴 인스턴스를 모두 종료 (사용 중인 인스턴스는 반환 시 종료)"""
+        with self._cond:
+            self._closed = True
+            idle = [driver for driver, _ in self._idle]
+            self._idle.clear()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for driver in idle:
+            driver.quit()
+        logging.info("브라우저 풀 종료 완료")
+
+class PasswordEngine:
+    """
+    비밀번호 추출 엔진
+    
+    패턴과 키워드 트라이를 생성 시 한 번만 컴파일하고, 메시지를 한 번만 토큰화해
+    기존 extract_from_text와 같은 우선순위(문맥 > 영숫자 혼합 > 영문 > 숫자 > 일반 패턴)로 결과를 고른다.
+    """
+    BASIC_EXCLUDED_WORDS = frozenset(['http', 'https', 'www', 'com', 'net', 'org'])
+    
+    PASSWORD_KEYWORDS = [
+        '비밀번호', '비번', '패스워드', '암호', '비밀 번호', '입장번호', '입장 번호',
+        'password', 'pwd', 'pw', 'pass', '코드', '입장코드', '입장 코드'
+    ]
+    
+    URL_PATTERN = re.compile(r'https?://\S+')
+    URL_SPLIT_PATTERN = re.compile(r'[/\.\?&=#]')
+    KEYWORD_VALUE_PATTERN = re.compile(r'[:\s]*([a-zA-Z0-9]{3,})')
+    # \b 경계 패턴과 동일한 단위(유니코드 단어)로 토큰화
+    TOKEN_PATTERN = re.compile(r'\w+')
+    
+    # 일반적인 비밀번호 패턴 (앞 단계에서 찾지 못한 경우에만 사용)
+    GENERAL_PATTERNS = [re.compile(p) for p in [
+        # 키워드 관련 패턴
+        r'(?:비밀번호|패스워드|비번|암호)[:\s]*([a-zA-Z0-9]{3,})',
+        r'(?:password|pwd|pw)[:\s]*([a-zA-Z0-9]{3,})',
+        r'(?:입장코드|코드)[:\s]*([a-zA-Z0-9]{3,})',
+        
+        # 문장 중간이나 끝에 있는 영숫자 패턴
+        r'[\s]([a-zA-Z0-9]{4,})[\s]',
+        r'[\s]([a-zA-Z0-9]{4,})$',
+        
+        # 특수문자로 구분된 영숫자 패턴
+        r'[^a-zA-Z0-9]([a-zA-Z0-9]{4,})[^a-zA-Z0-9]',
+    ]]
+    
+    # 토큰 종류별 우선순위 (영문+숫자 > 숫자+영문 > 영문 > 숫자)
+    MIXED_LETTER_FIRST, MIXED_DIGIT_FIRST, LETTERS_ONLY, DIGITS_ONLY = range(4)
+    
+    def __init__(self, keywords=None):
+        self.keywords = [keyword.lower() for keyword in (keywords or self.PASSWORD_KEYWORDS)]
+        self.keyword_pattern = re.compile(self._trie_pattern(self.keywords))
+    
+    @staticmethod
+    def _trie_pattern(words):
+        """키워드 목록을 공통 접두사로 묶은 트라이 정규식으로 변환"""
+        trie = {}
+        for word in words:
+            node = trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[''] = {}  # 단어 끝 표시
+        
+        def build(node):
+            branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not branches:
+                return ''
+            pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            if '' in node:
+                pattern = '(?:' + pattern + ')?'
+            return pattern
+        
+        return build(trie)
+    
+    def _strip_urls(self, text):
+        """URL을 제거한 텍스트와 URL 구성 단어(제외 목록)를 한 번에 생성"""
+        excluded_words = set(self.BASIC_EXCLUDED_WORDS)
+        
+        def collect(match):
+            parsed_url = match.group().split('://')[-1]
+            parts = (part.lower() for part in self.URL_SPLIT_PATTERN.split(parsed_url))
+            excluded_words.update(part for part in parts if len(part) >= 3)
+            return ''
+        
+        return self.URL_PATTERN.sub(collect, text), excluded_words
+    
+    @staticmethod
+    def _accept(word, excluded_words):
+        # 후보는 모두 ASCII 영숫자이므로 is_likely_password 검사는 길이/제외 단어 확인으로 충분
+        return 4 <= len(word) <= 20 and word.lower() not in excluded_words
+    
+    def _from_keywords(self, text, excluded_words):
+        """비밀번호 키워드 다음에 나오는 영숫자 추출 (키워드가 있는 줄만 검사)"""
+        if not self.keyword_pattern.search(text.lower()):
+            return None
+        
+        for line in text.split('\n'):
+            line_lower = line.lower()
+            if not self.keyword_pattern.search(line_lower):
+                continue
+            for keyword in self.keywords:
+                keyword_pos = line_lower.find(keyword)
+                if keyword_pos < 0:
+                    continue
+                match = self.KEYWORD_VALUE_PATTERN.search(line, keyword_pos + len(keyword))
+                if match and self._accept(match.group(1), excluded_words):
+                    return match.group(1)
+        return None
+    
+    def _from_tokens(self, text, excluded_words):
+        """한 번의 토큰화로 영숫자 혼합/영문/숫자 후보 중 우선순위가 가장 높은 것을 선택"""
+        best = [None] * 4
+        for match in self.TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            # \b([a-zA-Z0-9]+)\b 패턴과 같이 단어 전체가 ASCII 영숫자인 경우만 후보
+            if not (token.isascii() and token.isalnum()):
+                continue
+            if token.isalpha():
+                rank = self.LETTERS_ONLY
+            elif token.isdigit():
+                rank = self.DIGITS_ONLY
+            elif token[0].isalpha():
+                rank = self.MIXED_LETTER_FIRST
+            else:
+                rank = self.MIXED_DIGIT_FIRST
+            
+            if best[rank] is None and self._accept(token, excluded_words):
+                if rank == self.MIXED_LETTER_FIRST:
+                    return token
+                best[rank] = token
+        
+        for candidate in best:
+            if candidate:
+                return candidate
+        return None
+    
+    def _from_general_patterns(self, text, excluded_words):
+        for pattern in self.GENERAL_PATTERNS:
+            for match in pattern.findall(text):
+                if self._accept(match, excluded_words):
+                    return match
+        return None
+    
+    def extract(self, text):
+        text_without_urls, excluded_words = self._strip_urls(text)
+        
+        # 1. 문맥 기반 비밀번호 추출 (가장 정확한 방법)
+        password = self._from_keywords(text_without_urls, excluded_words)
+        if password:
+            logging.info(f"문맥 기반 비밀번호 추출: {password}")
+            return password
+        
+        # 2. 단어 단위 패턴 (영문+숫자 혼합 > 영문 > 숫자)
+        password = self._from_tokens(text_without_urls, excluded_words)
+        if password:
+            return password
+        
+        # 3. 일반적인 비밀번호 패턴 (단어 경계가 없는 영숫자 등)
+        # 단어 단위 분석은 2단계와 후보가 같으므로 별도로 수행하지 않음
+        return self._from_general_patterns(text_without_urls, excluded_words)
+
 class PasswordExtractor:
+    engine = PasswordEngine()
+    
+    URL_PREFIX_PATTERN = re.compile(r'^https?://')
+    LETTER_PATTERN = re.compile(r'[a-zA-Z]')
+    DIGIT_PATTERN = re.compile(r'[0-9]')
+    
     @staticmethod
     def is_likely_password(text):
         # 길이 확인 (4-20자)
@@ -368,19 +1197,16 @@ class PasswordExtractor:
             return False
         
         # 최소한의 URL 관련 단어만 필터링 (전체 단어 일치만 확인)
-        basic_url_words = ['http', 'https', 'www', 'com', 'net', 'org']
-        if text.lower() in basic_url_words:
+        if text.lower() in PasswordEngine.BASIC_EXCLUDED_WORDS:
             return False
         
-        # 영어와 숫자 확인
-        has_letter = bool(re.search(r'[a-zA-Z]', text))
-        has_digit = bool(re.search(r'[0-9]', text))
-        
         # URL이나 이메일 형식은 제외
-        if re.match(r'^https?://', text) or '@' in text:
+        if PasswordExtractor.URL_PREFIX_PATTERN.match(text) or '@' in text:
             return False
             
         # 특수문자만 있는 경우 제외
+        has_letter = PasswordExtractor.LETTER_PATTERN.search(text) is not None
+        has_digit = PasswordExtractor.DIGIT_PATTERN.search(text) is not None
         if not has_letter and not has_digit:
             return False
         
@@ -393,354 +1219,1617 @@ class PasswordExtractor:
     @staticmethod
     def extract_from_text(text):
         """
-        텍스트에서 비밀번호 추출 함수 (개선된 버전)
+        텍스트에서 비밀번호 추출 함수 (사전 컴파일된 단일 패스 엔진 사용)
         """
-        # URL 추출 및 URL에 포함된 단어 목록 생성
-        urls = re.findall(r'https?://\S+', text)
-        url_words = set()
-        for url in urls:
-            # URL을 파싱하여 path 부분을 추출
-            parsed_url = url.split('://')[-1]  # http:// 또는 https:// 제거
-            # 슬래시, 마침표, 물음표 등으로 분리
-            parts = re.split(r'[/\.\?&=#]', parsed_url)
-            # 단어 추가 (비어있는 문자열 제외)
-            url_words.update([part.lower() for part in parts if part])
+        return PasswordExtractor.engine.extract(text)
+
+class OcrResultCache:
+    """
+    OCR 결과 캐시 (2단계)
+    
+    1단계: 텔레그램 사진 id/access_hash - 다운로드 전에 확인
+    2단계: 디코딩한 이미지의 지각 해시(dHash) - 다시 업로드된 같은 이미지 확인
+    두 단계 모두 LRU로 관리하며 디스크에 저장해 재시작 후에도 유지한다.
+    """
+    def __init__(self, cache_file=None, max_size=None, save_interval=20):
+        self.cache_file = cache_file or Config.OCR_CACHE_FILE
+        self.max_size = max_size or Config.OCR_CACHE_SIZE
+        self.save_interval = save_interval
+        self.max_distance = Config.OCR_CACHE_MAX_DISTANCE
+        self.photos = OrderedDict()  # "photo_id:access_hash" -> 비밀번호 (없으면 None)
+        self.hashes = OrderedDict()  # dHash(hex) -> 비밀번호 (없으면 None)
+        self.hits = {'photo': 0, 'hash': 0}
+        self.misses = 0
+        self.changes_since_save = 0
+        self._load_cache()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.photos = OrderedDict(data.get('photos', []))
+            self.hashes = OrderedDict(data.get('hashes', []))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Failed to load OCR cache: {e}")
+
+    def _save_cache(self):
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'photos': list(self.photos.items()),
+                    'hashes': list(self.hashes.items()),
+                }, f, ensure_ascii=False)
+        except Exception as e:
+            logging.error(f"Failed to save OCR cache: {e}")
+
+    @staticmethod
+    def photo_key(photo):
+        """텔레그램 Photo 객체에서 1단계 캐시 키 생성"""
+        if photo is None or not getattr(photo, 'id', None):
+            return None
+        return f"{photo.id}:{getattr(photo, 'access_hash', 0)}"
+
+    @staticmethod
+    def image_hash(image, hash_size=None):
+        """
+        NumPy로 계산한 차이 해시(dHash)
+        
+        (hash_size+1) x hash_size 흑백 축소 이미지에서 가로로 인접한 픽셀의 밝기 비교 결과를 비트로 묶는다.
+        """
+        hash_size = hash_size or Config.OCR_CACHE_HASH_SIZE
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+        return np.packbits(bits).tobytes().hex()
+
+    def _lookup(self, table, key):
+        value = table[key]
+        table.move_to_end(key)
+        return value
+
+    def get_photo(self, photo_key):
+        """1단계 조회: (적중 여부, 비밀번호)"""
+        if photo_key and photo_key in self.photos:
+            self.hits['photo'] += 1
+            return True, self._lookup(self.photos, photo_key)
+        return False, None
+
+    def peek_photo(self, photo_key):
+        """통계와 LRU 순서를 바꾸지 않고 캐시된 비밀번호만 확인 (없으면 None)"""
+        return self.photos.get(photo_key) if photo_key else None
+
+    def get_image(self, image_hash):
+        """2단계 조회: 같은 해시 또는 해밍 거리 max_distance 이내의 해시"""
+        if image_hash in self.hashes:
+            self.hits['hash'] += 1
+            return True, self._lookup(self.hashes, image_hash)
         
-        # URL 제거한 텍스트 생성
-        text_without_urls = re.sub(r'https?://\S+', '', text)
+        if self.max_distance > 0 and self.hashes:
+            keys = [key for key in self.hashes if len(key) == len(image_hash)]
+            if keys:
+                stored = np.frombuffer(bytes.fromhex(''.join(keys)), dtype=np.uint8).reshape(len(keys), -1)
+                query = np.frombuffer(bytes.fromhex(image_hash), dtype=np.uint8)
+                distances = np.unpackbits(stored ^ query, axis=1).sum(axis=1)
+                best = int(distances.argmin())
+                if distances[best] <= self.max_distance:
+                    self.hits['hash'] += 1
+                    return True, self._lookup(self.hashes, keys[best])
         
-        # 최소한의 기본 제외 단어 목록 (URL 스킴과 TLD만 포함)
-        basic_excluded_words = ['http', 'https', 'www', 'com', 'net', 'org']
+        self.misses += 1
+        return False, None
+
+    @staticmethod
+    def _store(table, key, value, max_size):
+        if key in table:
+            table.move_to_end(key)
+        elif len(table) >= max_size:
+            table.popitem(last=False)
+        table[key] = value
+
+    def put(self, photo_key, image_hash, password):
+        if photo_key:
+            self._store(self.photos, photo_key, password, self.max_size)
+        if image_hash:
+            self._store(self.hashes, image_hash, password, self.max_size)
+        self.changes_since_save += 1
         
-        # URL에서 추출한 단어들 추가
-        excluded_words = set(basic_excluded_words)
-        excluded_words.update(url_words)
+        if self.changes_since_save >= self.save_interval:
+            self._save_cache()
+            self.changes_since_save = 0
+
+    def stats(self):
+        return {
+            'photo_hits': self.hits['photo'],
+            'hash_hits': self.hits['hash'],
+            'misses': self.misses,
+            'entries': len(self.hashes),
+        }
+
+    def flush(self):
+        if self.changes_since_save > 0:
+            self._save_cache()
+            self.changes_since_save = 0
+
+class OcrImageEncoder:
+    """
+    OCR 업로드용 이미지 전처리/인코딩 단계
+    
+    흑백 변환, 대비 정규화, (선택) 이진화를 벡터 연산으로 적용한 뒤
+    원본 JPEG 그대로 / JPEG 재인코딩 / PNG 중 가장 작은 인코딩을 고르고,
+    바이트 예산을 넘으면 JPEG 품질을 낮춰 예산 안에 맞춘다.
+    """
+    JPEG_SIGNATURE = b'\xff\xd8\xff'
+    
+    @staticmethod
+    def normalize_contrast(gray, clip_percent=1.0):
+        """히스토그램 양끝 clip_percent%를 잘라 0-255로 늘림 (정렬 없이 누적 히스토그램 사용)"""
+        hist = np.bincount(gray.ravel(), minlength=256)
+        cdf = np.cumsum(hist)
+        clip = cdf[-1] * clip_percent / 100.0
+        low = int(np.searchsorted(cdf, clip, side='right'))
+        high = int(np.searchsorted(cdf, cdf[-1] - clip, side='left'))
+        if high <= low:
+            return gray
+        lut = np.clip((np.arange(256, dtype=np.float32) - low) * (255.0 / (high - low)), 0, 255).astype(np.uint8)
+        return lut[gray]
+    
+    @staticmethod
+    def enhance(image):
+        """설정에 따라 흑백 변환, 대비 정규화, 이진화 적용. 변경이 있었는지 함께 반환"""
+        changed = False
+        if Config.OCR_GRAYSCALE and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            changed = True
+        if Config.OCR_NORMALIZE_CONTRAST and image.ndim == 2:
+            image = OcrImageEncoder.normalize_contrast(image)
+            changed = True
+        if Config.OCR_BINARIZE and image.ndim == 2:
+            _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            changed = True
+        return image, changed
+    
+    @staticmethod
+    def _encode(image, fmt, quality=None):
+        if fmt == 'jpg':
+            ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        else:
+            ok, encoded = cv2.imencode('.png', image)
+        return encoded.tobytes() if ok else None
+    
+    @staticmethod
+    def encode(image, original=None):
+        """
+        가장 작은 인코딩 선택
         
-        # 중복 제거 및 소문자화 (비교용)
-        excluded_words_lower = set([word.lower() for word in excluded_words if word and len(word) >= 3])
+        original: 이미지가 변경되지 않았을 때 그대로 보낼 수 있는 원본 바이트 (JPEG인 경우만 사용)
+        반환값: (인코딩된 바이트, 형식('jpg'/'png'))
+        """
+        png_bytes = OcrImageEncoder._encode(image, 'png')
+        candidates = [(png_bytes, 'png')]
+        if original is not None and bytes(original[:3]) == OcrImageEncoder.JPEG_SIGNATURE:
+            candidates.append((bytes(original), 'jpg'))
+        # 이진화된 이미지는 PNG가 작고 JPEG 압축 잡음이 인식을 해치므로 JPEG 재인코딩 제외
+        if not Config.OCR_BINARIZE:
+            candidates.append((OcrImageEncoder._encode(image, 'jpg', Config.OCR_JPEG_QUALITY), 'jpg'))
         
-        # 1. 문맥 기반 비밀번호 추출 (가장 정확한 방법)
-        # 비밀번호 관련 키워드 다음에 나오는 단어를 추출
-        password_keywords = [
-            '비밀번호', '비번', '패스워드', '암호', '비밀 번호', '입장번호', '입장 번호',
-            'password', 'pwd', 'pw', 'pass', '코드', '입장코드', '입장 코드'
-        ]
+        img_bytes, fmt = min((c for c in candidates if c[0]), key=lambda c: len(c[0]))
         
-        # 줄별로 분석
-        lines = text_without_urls.split('\n')
-        for line in lines:
-            # 비밀번호 키워드가 있는지 확인
-            for keyword in password_keywords:
-                if keyword.lower() in line.lower():
-                    # 키워드 다음에 나오는 영숫자 추출
-                    keyword_pos = line.lower().find(keyword.lower())
-                    after_keyword = line[keyword_pos + len(keyword):]
-                    
-                    # 비밀번호 패턴 찾기 (키워드 다음 부분에서)
-                    # 콜론, 공백 등으로 구분된 영숫자 찾기
-                    password_pattern = r'[:\s]*([a-zA-Z0-9]{3,})'
-                    match = re.search(password_pattern, after_keyword)
-                    if match:
-                        candidate = match.group(1).strip()
-                        
-                        # 대소문자 구분하여 원본 그대로 저장
-                        # 후보 비밀번호가 제외 단어 목록에 있는지 확인 (전체 단어 일치만 확인)
-                        if (4 <= len(candidate) <= 20 and 
-                            candidate.lower() not in excluded_words_lower and 
-                            PasswordExtractor.is_likely_password(candidate)):
-                            logging.info(f"문맥 기반 비밀번호 추출: {candidate}")
-                            return candidate
-        
-        # 2. 특정 패턴으로 비밀번호 추출
-        # 영어+숫자 혼합 패턴 (가장 일반적인 비밀번호 형태 - 최우선 추출)
-        mixed_patterns = [
-            r'\b([a-zA-Z]+[0-9]+[a-zA-Z0-9]*)\b',  # 영문 다음 숫자
-            r'\b([0-9]+[a-zA-Z]+[a-zA-Z0-9]*)\b',  # 숫자 다음 영문
-        ]
+        # 바이트 예산 초과 시 JPEG 품질을 단계적으로 낮춤
+        quality = Config.OCR_JPEG_QUALITY
+        while len(img_bytes) > Config.OCR_MAX_UPLOAD_BYTES and quality > Config.OCR_MIN_JPEG_QUALITY:
+            quality = max(Config.OCR_MIN_JPEG_QUALITY, quality - 10)
+            encoded = OcrImageEncoder._encode(image, 'jpg', quality)
+            if encoded and len(encoded) < len(img_bytes):
+                img_bytes, fmt = encoded, 'jpg'
         
-        # 영어 패턴 (두 번째 우선순위)
-        english_patterns = [
-            r'\b([a-zA-Z]{4,})\b'  # 영문만
-        ]
+        return img_bytes, fmt
+
+class ClovaOcrClient:
+    """
+    CLOVA OCR 비동기 클라이언트
+    
+    keep-alive 연결 풀을 가진 세션 하나를 재사용하고, 이미지 전처리와 HTTP 요청은
+    전용 스레드풀에서 실행해 이벤트 루프(메시지 수신)를 막지 않는다.
+    동시 OCR 요청 수는 세마포어로 제한한다.
+    """
+    def __init__(self, max_concurrency=None, cache=None):
+        self.max_concurrency = max_concurrency or Config.OCR_MAX_CONCURRENCY
+        self.cache = cache
+        self.bytes_saved = 0  # 이전 업로드 방식(PNG base64 JSON) 대비 줄인 누적 요청 본문 바이트
+        self.savings_lock = threading.Lock()
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='ocr')
+        self.session = self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        session.verify = False
+        session.headers.update({'X-OCR-SECRET': Config.CLOVA_OCR_SECRET_KEY})
+        
+        # 자동 재시도 설정 (재시도 대기는 OCR 스레드에서만 발생)
+        retry_strategy = Retry(
+            total=3,  # 최대 3번 재시도
+            status_forcelist=[429, 500, 502, 503, 504],  # 재시도할 HTTP 상태 코드
+            allowed_methods=["POST"],  # POST 요청에 대해 재시도 허용
+            backoff_factor=1  # 재시도 간 대기 시간 (초)
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.max_concurrency,
+            max_retries=retry_strategy
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @staticmethod
+    def _debug_path(debug_name, suffix):
+        debug_dir = os.path.join(Config.IMAGE_DIR, "debug")
+        os.makedirs(debug_dir, exist_ok=True)
+        base_filename = os.path.basename(debug_name).split('.')[0]
+        return os.path.join(debug_dir, f"{base_filename}_{suffix}")
+
+    @staticmethod
+    def load_image(source):
+        """
+        파일 경로 또는 메모리 버퍼(bytes)에서 이미지 디코딩
+        
+        반환값: (디코딩된 이미지 또는 None, 원본 바이트)
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            data = source
+        else:
+            # 이미지 파일 존재 확인 (한 번만 체크)
+            if not os.path.isfile(source):
+                logging.error(f"이미지 파일이 존재하지 않습니다: {source}")
+                return None, None
+            with open(source, 'rb') as f:
+                data = f.read()
+        
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR) if buffer.size else None
+        if image is None:
+            logging.error(f"이미지를 디코딩할 수 없습니다 ({buffer.size} bytes)")
+        return image, data
+
+    @staticmethod
+    def preprocess(source, debug_name):
+        """
+        이미지를 디코딩해 크기를 줄이고 OCR용으로 전처리/인코딩 (CPU 작업, 스레드풀에서 실행)
+        
+        source는 파일 경로 또는 다운로드한 바이트이며, 디스크에는 디버그 모드일 때만 기록한다.
+        반환값: (인코딩된 이미지 바이트, 형식, 지각 해시, 전처리 전 크기만 줄인 이미지) 또는 None
+        마지막 값은 이전 업로드 방식과 요청 크기를 비교할 때 쓴다 (baseline_body_size).
+        """
+        image, original = ClovaOcrClient.load_image(source)
+        if image is None:
+            return None
+        
+        if Config.DEBUG_MODE and not isinstance(source, str):
+            with open(ClovaOcrClient._debug_path(debug_name, "original.jpg"), 'wb') as f:
+                f.write(source)
+        
+        # 캐시 키로 쓸 지각 해시 (원본 디코딩 이미지 기준)
+        image_hash = OcrResultCache.image_hash(image)
+        source_size = len(original)
+        
+        # 이미지 크기 최적화 (필요한 경우)
+        h, w = image.shape[:2]
+        if max(h, w) > Config.MAX_IMAGE_DIMENSION:
+            scale = Config.MAX_IMAGE_DIMENSION / max(h, w)
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            original = None  # 크기가 바뀌면 원본 그대로 보낼 수 없음
+        resized = image
+        
+        image, changed = OcrImageEncoder.enhance(image)
+        if changed:
+            original = None
+        
+        # 디버깅 관련 코드는 디버그 모드일 때만 실행
+        if Config.DEBUG_MODE:
+            cv2.imwrite(ClovaOcrClient._debug_path(debug_name, "resized.png"), image)
+        
+        img_bytes, fmt = OcrImageEncoder.encode(image, original)
+        logging.info(f"OCR 이미지 인코딩: 원본 {source_size:,} bytes -> {fmt} {len(img_bytes):,} bytes")
+        return img_bytes, fmt, image_hash, resized
+
+    @staticmethod
+    def build_request(img_bytes, upload_mode=None, fmt='png'):
+        """
+        session.post에 넘길 요청 본문 인자 생성
+        
+        multipart: 'message'(JSON 메타데이터) + 'file'(이미지 바이트) 폼으로 전송해 base64/JSON 복사를 생략
+        json: 기존 방식 (base64 인코딩한 이미지를 JSON 본문에 포함)
+        """
+        upload_mode = upload_mode or Config.OCR_UPLOAD_MODE
+        
+        # 요청 데이터 구성
+        message = {
+            'version': 'V2',
+            'requestId': 'ocr-request-' + hashlib.md5(img_bytes).hexdigest(),
+            'timestamp': int(time.time() * 1000),
+            'images': [
+                {
+                    'format': fmt,
+                    'name': 'image'
+                }
+            ]
+        }
+        
+        if upload_mode == 'json':
+            message['images'][0]['data'] = base64.b64encode(img_bytes).decode('utf-8')
+            return {'json': message}
+        
+        return {
+            'data': {'message': json.dumps(message)},
+            'files': {'file': (f'image.{fmt}', img_bytes, 'image/png' if fmt == 'png' else 'image/jpeg')},
+        }
+
+    @staticmethod
+    def body_size(img_bytes, upload_mode=None, fmt='png'):
+        """실제 전송될 HTTP 요청 본문 크기 (bytes)"""
+        request = requests.Request(
+            'POST',
+            Config.CLOVA_OCR_API_URL or 'https://localhost/ocr',
+            **ClovaOcrClient.build_request(img_bytes, upload_mode, fmt)
+        ).prepare()
+        return len(request.body)
+
+    @staticmethod
+    def baseline_body_size(resized):
+        """이전 방식(크기만 줄인 이미지를 PNG로 인코딩해 base64 JSON으로 전송)의 요청 본문 크기"""
+        _, png_encoded = cv2.imencode('.png', resized)
+        return ClovaOcrClient.body_size(png_encoded.tobytes(), 'json', 'png')
+
+    def _record_savings(self, resized, img_bytes, fmt):
+        """이전 방식 대비 줄인 요청 본문 크기 누적 (OCR 요청 이후 스레드풀에서 실행)"""
+        try:
+            saved = self.baseline_body_size(resized) - self.body_size(img_bytes, fmt=fmt)
+            with self.savings_lock:
+                self.bytes_saved += saved
+        except Exception as e:
+            logging.debug(f"OCR 업로드 절감량 계산 실패: {e}")
+
+    def post(self, img_bytes, upload_mode=None, fmt='png'):
+        """CLOVA OCR API 요청 전송 (블로킹)"""
+        # 연결 타임아웃 및 읽기 타임아웃 설정
+        return self.session.post(
+            Config.CLOVA_OCR_API_URL,
+            timeout=(5, 30),  # 연결 타임아웃 5초, 읽기 타임아웃 30초
+            **self.build_request(img_bytes, upload_mode, fmt)
+        )
+
+    def _request(self, img_bytes, fmt, debug_name):
+        """
+        CLOVA OCR API 호출 (블로킹, 스레드풀에서 실행)
+        """
+        response = self.post(img_bytes, fmt=fmt)
+        
+        # 응답 결과 확인
+        if response.status_code != 200:
+            logging.error(f"CLOVA OCR API 오류: 상태 코드 {response.status_code}")
+            return None
+        
+        result = response.json()
+        
+        # 디버깅용 OCR 결과 저장 (디버그 모드일 때만)
+        if Config.DEBUG_MODE:
+            with open(self._debug_path(debug_name, "ocr_result.json"), 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        
+        return result
+
+    @staticmethod
+    def parse_text(result):
+        """OCR 결과에서 인식된 텍스트를 하나의 문자열로 결합"""
+        extracted_texts = []
+        for image_result in result.get('images') or []:
+            for field in image_result.get('fields', []):
+                if 'inferText' in field:
+                    extracted_texts.append(field['inferText'])
+        return ' '.join(extracted_texts)
+
+    async def extract_password(self, source, photo_key=None, debug_name=None):
+        """
+        이미지에서 CLOVA OCR API를 사용하여 비밀번호 추출 (이벤트 루프를 막지 않음)
+        
+        source는 이미지 파일 경로 또는 메모리로 다운로드한 바이트.
+        디코딩한 이미지의 해시가 캐시에 있으면 OCR 요청 없이 캐시된 결과를 돌려준다.
+        """
+        try:
+            # CLOVA OCR API URL과 Secret Key 확인
+            if not Config.CLOVA_OCR_API_URL or not Config.CLOVA_OCR_SECRET_KEY:
+                logging.error("CLOVA OCR API URL 또는 Secret Key가 설정되지 않았습니다.")
+                return None
+            
+            if debug_name is None:
+                debug_name = source if isinstance(source, str) else f"photo_{int(time.time() * 1000)}"
+            
+            loop = asyncio.get_running_loop()
+            async with self.semaphore:
+                prepared = await loop.run_in_executor(self.executor, self.preprocess, source, debug_name)
+                if prepared is None:
+                    return None
+                img_bytes, fmt, image_hash, resized = prepared
+                
+                if self.cache is not None:
+                    hit, password = self.cache.get_image(image_hash)
+                    if hit:
+                        logging.info(f"OCR 캐시 적중 (이미지 해시): {password}")
+                        self.cache.put(photo_key, image_hash, password)
+                        return password
+                
+                result = await loop.run_in_executor(self.executor, self._request, img_bytes, fmt, debug_name)
+            # 절감량 계산(PNG 인코딩)은 비밀번호 반영을 늦추지 않도록 기다리지 않음
+            loop.run_in_executor(self.executor, self._record_savings, resized, img_bytes, fmt)
+            if result is None:
+                return None
+            
+            combined_text = self.parse_text(result)
+            
+            # 디버깅용 추출 텍스트 저장 (디버그 모드일 때만)
+            if combined_text and Config.DEBUG_MODE:
+                with open(self._debug_path(debug_name, "extracted_text.txt"), 'w', encoding='utf-8') as f:
+                    f.write(combined_text)
+            
+            # 추출된 텍스트에서 비밀번호 찾기
+            password = PasswordExtractor.extract_from_text(combined_text) if combined_text else None
+            
+            # 비밀번호가 없다는 결과도 캐시해 같은 이미지의 재요청을 막음
+            if self.cache is not None:
+                self.cache.put(photo_key, image_hash, password)
+            return password
+        except Exception as e:
+            logging.error(f"이미지에서 비밀번호 추출 중 오류: {e}", exc_info=True)
+            return None
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+class DigestRing:
+    """
+    고정 크기 다이제스트 링 버퍼
+    
+    8바이트 다이제스트를 미리 할당한 array 링에 저장하고, 링 위치를 가리키는
+    오픈 어드레싱(선형 탐사) 인덱스로 O(1) 조회/추가/만료를 제공한다.
+    100만 개 기준 링 8MB + 인덱스 8MB 정도만 사용한다.
+    """
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self.ring = array('q', [0]) * self.capacity  # 다이제스트 (부호 있는 64비트)
+        index_size = 1
+        while index_size < self.capacity * 2:  # 부하율 0.5 이하 유지
+            index_size <<= 1
+        self.mask = index_size - 1
+        self.index = array('I', [0]) * index_size  # 링 위치 + 1 (0은 빈 칸)
+        self.head = 0  # 다음에 쓸 링 위치 (가득 찬 경우 가장 오래된 항목)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _find(self, digest):
+        """digest를 가리키는 인덱스 칸 위치 (없으면 -1)"""
+        ring, index, mask = self.ring, self.index, self.mask
+        i = digest & mask
+        while True:
+            entry = index[i]
+            if entry == 0:
+                return -1
+            if ring[entry - 1] == digest:
+                return i
+            i = (i + 1) & mask
+
+    def __contains__(self, digest):
+        return self._find(digest) >= 0
+
+    def _remove_at(self, i):
+        """선형 탐사 인덱스에서 칸 i를 비우고 뒤따르는 항목을 당겨 채움 (삭제 표시 없이 유지)"""
+        ring, index, mask = self.ring, self.index, self.mask
+        j = i
+        while True:
+            j = (j + 1) & mask
+            entry = index[j]
+            if entry == 0:
+                break
+            home = ring[entry - 1] & mask
+            # home이 (i, j] 구간 밖이면 i로 옮겨도 탐사 경로가 유지됨
+            if (i < j and (home <= i or home > j)) or (i > j and home <= i and home > j):
+                index[i] = entry
+                i = j
+        index[i] = 0
+
+    def add(self, digest):
+        """새 다이제스트 추가 (가득 차면 가장 오래된 항목을 밀어냄). 호출 전 중복 여부를 확인할 것"""
+        slot = self.head
+        if self.size == self.capacity:
+            self._remove_at(self._find(self.ring[slot]))
+        else:
+            self.size += 1
+        
+        self.ring[slot] = digest
+        i = digest & self.mask
+        while self.index[i] != 0:
+            i = (i + 1) & self.mask
+        self.index[i] = slot + 1
+        self.head = (slot + 1) % self.capacity
+
+    def __iter__(self):
+        """오래된 순서로 순회"""
+        start = self.head if self.size == self.capacity else 0
+        for k in range(self.size):
+            yield self.ring[(start + k) % self.capacity]
+
+class MessageCache:
+    """
+    중복 메시지 캐시
+    
+    메시지 md5의 앞 8바이트만 DigestRing에 보관하고, SQLite(WAL 모드)에 한 줄씩 추가해 저장하므로
+    add_message마다 O(1) I/O로 기록되고 비정상 종료 시에도 유실이 없다.
+    시작 시에는 최근 max_size개만 읽고, 오래된 행은 compact_interval번 추가마다 한 번씩 정리한다.
+    """
+    def __init__(self, max_size=None, db_file=None, compact_interval=None):
+        self.db_file = db_file or Config.MESSAGE_CACHE_DB
+        self.max_size = max_size or Config.MESSAGE_CACHE_SIZE
+        self.compact_interval = compact_interval or max(50, self.max_size // 10)
+        self.cache = DigestRing(self.max_size)
+        self.changes_since_compact = 0
+        self.conn = self._connect()
+        self._migrate_json_cache()
+        self._load_cache()
+    
+    @staticmethod
+    def digest(message):
+        """메시지 md5의 앞 8바이트 (부호 있는 64비트 정수)"""
+        return MessageCache.hex_digest(hashlib.md5(message.encode()).hexdigest())
+    
+    @staticmethod
+    def hex_digest(md5_hex):
+        return int.from_bytes(bytes.fromhex(md5_hex[:16]), 'big', signed=True)
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # WAL에서는 프로세스 비정상 종료에도 커밋 유지
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS message_digests ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'digest INTEGER NOT NULL UNIQUE)'
+        )
+        conn.commit()
+        return conn
+    
+    def _import(self, md5_hexes):
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO message_digests (digest) VALUES (?)',
+            ((self.hex_digest(md5_hex),) for md5_hex in md5_hexes)
+        )
+        self.conn.commit()
+    
+    def _migrate_json_cache(self, legacy_file='message_cache.json'):
+        """이전 버전의 message_cache.json을 한 번만 가져옴"""
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                legacy = OrderedDict(json.load(f))
+            self._import(legacy)
+            os.replace(legacy_file, legacy_file + '.migrated')
+            logging.info(f"기존 메시지 캐시 {len(legacy)}개를 {self.db_file}로 이전")
+        except Exception as e:
+            logging.error(f"Failed to migrate cache: {e}")
+    
+    def _load_cache(self):
+        try:
+            rows = self.conn.execute(
+                'SELECT digest FROM message_digests ORDER BY seq DESC LIMIT ?', (self.max_size,)
+            ).fetchall()
+            for (digest,) in reversed(rows):
+                self.cache.add(digest)
+            logging.info(f"메시지 캐시 로드: {len(self.cache)}/{self.max_size}")
+        except Exception as e:
+            logging.error(f"Failed to load cache: {e}")
+    
+    def _compact(self):
+        """최근 max_size개를 제외한 오래된 행 삭제 (INSERT OR REPLACE로 seq에 빈 번호가 생기므로 순위 기준)"""
+        try:
+            self.conn.execute(
+                'DELETE FROM message_digests WHERE seq <= '
+                '(SELECT seq FROM message_digests ORDER BY seq DESC LIMIT 1 OFFSET ?)',
+                (self.max_size,)
+            )
+            self.conn.commit()
+        except Exception as e:
+            logging.error(f"Failed to compact cache: {e}")
+    
+    def add_message(self, message):
+        message_hash = self.digest(message)
+        
+        if message_hash in self.cache:
+            return False
+        
+        self.cache.add(message_hash)
+        
+        # 한 행만 추가 (이미 밀려난 다이제스트가 남아 있으면 최신 순번으로 교체)
+        try:
+            self.conn.execute('INSERT OR REPLACE INTO message_digests (digest) VALUES (?)', (message_hash,))
+            self.conn.commit()
+        except Exception as e:
+            logging.error(f"Failed to save cache: {e}")
+        
+        self.changes_since_compact += 1
+        if self.changes_since_compact >= self.compact_interval:
+            self._compact()
+            self.changes_since_compact = 0
+        
+        return True
+    
+    # 종료 시 저장 보장을 위한 메서드
+    def flush(self):
+        try:
+            self._compact()
+            self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except Exception as e:
+            logging.error(f"Failed to checkpoint cache: {e}")
+    
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+class RecentUpdateSet:
+    """
+    두 클라이언트(사용자 계정, 봇)가 함께 받은 업데이트 중복 제거
+    
+    필터나 정규식 검사 전에 (채팅방 ID, 메시지 ID)만으로 처리 중이거나 최근 처리한 메시지를 걸러낸다.
+    메시지 ID는 채널/슈퍼그룹에서만 계정 간에 같고, 일반 그룹과 개인 대화에서는 계정마다 따로 매겨지므로
+    그런 메시지는 받은 클라이언트별로 구분한다 (계정 간 중복은 메시지 캐시가 처리).
+    """
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or Config.UPDATE_DEDUPE_SIZE
+        self.ttl = Config.UPDATE_DEDUPE_TTL if ttl is None else ttl
+        self.entries = OrderedDict()  # 키 -> 처리 시작 시각
+        self.accepted = 0
+        self.duplicates = 0
+    
+    @staticmethod
+    def key(event):
+        message = event.message
+        if getattr(event, 'is_channel', False):
+            return (event.chat_id, message.id)
+        return (id(event.client), event.chat_id, message.id)
+    
+    def claim(self, event):
+        """처음 보는 업데이트면 True (이후 같은 업데이트는 False)"""
+        key = self.key(event)
+        now = time.monotonic()
+        seen_at = self.entries.get(key)
+        if seen_at is not None and now - seen_at < self.ttl:
+            self.duplicates += 1
+            return False
+        
+        self.entries[key] = now
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        self.accepted += 1
+        return True
+    
+    def stats(self):
+        return {'accepted': self.accepted, 'duplicates_avoided': self.duplicates, 'size': len(self.entries)}
+
+class ChatHighWaterMarks:
+    """
+    채팅방별 마지막으로 받은 메시지 ID (재연결/재시작 후 백필 시작 지점)
+    
+    advance는 메모리만 갱신하고, flush를 호출할 때 바뀐 채팅방만 한 번에 SQLite에 기록한다.
+    비정상 종료로 마지막 기록 이후 위치가 유실되어도 다시 가져온 메시지는 메시지 캐시에서 중복으로 걸러진다.
+    """
+    def __init__(self, db_file=None):
+        self.db_file = db_file or Config.MESSAGE_CACHE_DB
+        self.marks = {}  # 채팅방 ID -> (메시지 ID, 갱신 시각)
+        self.dirty = set()
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS chat_high_water ('
+            'chat_id INTEGER PRIMARY KEY, '
+            'message_id INTEGER NOT NULL, '
+            'updated_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+        self._load()
+    
+    def _load(self):
+        try:
+            rows = self.conn.execute('SELECT chat_id, message_id, updated_at FROM chat_high_water').fetchall()
+            self.marks = {chat_id: (message_id, updated_at) for chat_id, message_id, updated_at in rows}
+            logging.info(f"채팅방별 마지막 메시지 위치 로드: {len(self.marks)}개")
+        except Exception as e:
+            logging.error(f"Failed to load high-water marks: {e}")
+    
+    def advance(self, chat_id, message_id):
+        current = self.marks.get(chat_id)
+        if current is not None and current[0] >= message_id:
+            return
+        self.marks[chat_id] = (message_id, time.time())
+        self.dirty.add(chat_id)
+    
+    def active(self, max_idle):
+        """max_idle초 안에 갱신된 (채팅방 ID, 메시지 ID) 목록"""
+        cutoff = time.time() - max_idle
+        return [(chat_id, message_id) for chat_id, (message_id, updated_at) in self.marks.items()
+                if updated_at >= cutoff]
+    
+    def flush(self):
+        if not self.dirty:
+            return
+        try:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO chat_high_water (chat_id, message_id, updated_at) VALUES (?, ?, ?)',
+                ((chat_id, *self.marks[chat_id]) for chat_id in self.dirty)
+            )
+            self.conn.commit()
+            self.dirty.clear()
+        except Exception as e:
+            logging.error(f"Failed to save high-water marks: {e}")
+    
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+class CatchUpEvent:
+    """iter_messages로 가져온 메시지를 NewMessage 이벤트처럼 처리하기 위한 래퍼"""
+    def __init__(self, message):
+        self.message = message
+    
+    def __getattr__(self, name):
+        return getattr(self.message, name)
+
+class MissedUpdateCatchUp:
+    """
+    연결이 끊겼거나 재시작하는 동안 놓친 메시지 백필
+    
+    감시 클라이언트(사용자 계정)가 받은 메시지로 채팅방별 마지막 메시지 ID를 기록해 두고,
+    누락 구간이 시작될 때(시작 시 저장된 위치를 불러올 때, 연결 오류를 처음 감지했을 때) 최근 활동한 채팅방의
+    위치를 구간 시작점으로 고정한다. 이후 처음 실시간으로 받은 메시지 ID를 구간 끝으로 삼아,
+    백필이 늦게 시작되어 실시간 메시지가 위치를 앞으로 옮겨 놓았더라도 누락 구간만 정확히 조회한다.
+    조회는 최대 concurrency개 채팅방씩 iter_messages(min_id=..., max_id=...)로 하고,
+    가져온 메시지는 일반 메시지와 같은 process_message 경로로 넘긴다.
+    메시지 시각은 원래 수신 시각이므로 JOIN_MAX_AGE가 지난 링크는 참여 대기열에서 버려진다.
+    """
+    def __init__(self, client, handler, marks=None, concurrency=None, limit=None, max_age=None, active_ttl=None):
+        self.client = client
+        self.handler = handler
+        self.marks = marks or ChatHighWaterMarks()
+        self.semaphore = asyncio.Semaphore(concurrency or Config.CATCHUP_CONCURRENCY)
+        self.limit = limit or Config.CATCHUP_LIMIT
+        self.max_age = Config.CATCHUP_MAX_AGE if max_age is None else max_age
+        self.active_ttl = Config.CATCHUP_ACTIVE_TTL if active_ttl is None else active_ttl
+        self.gaps = {}  # 채팅방 ID -> [구간 시작 메시지 ID, 구간 이후 처음 받은 실시간 메시지 ID 또는 None]
+        self.pending = {}  # 채팅방 ID -> [마지막 반영 이후 받은 가장 작은 메시지 ID, 가장 큰 메시지 ID]
+        self.running = False
+        self.rerun = False
+        self.runs = 0
+        self.backfilled = 0
+        self.truncated = 0  # CATCHUP_LIMIT에 걸려 일부를 못 가져온 채팅방 수
+        self.open_gap()  # 재시작 동안의 누락 구간 (저장된 위치부터)
+    
+    def open_gap(self):
+        """최근 활동한 채팅방의 현재 위치를 누락 구간 시작점으로 고정 (이미 열린 구간은 시작점 유지, 끝만 다시 열어 둠)"""
+        self.merge()
+        for chat_id, message_id in self.marks.active(self.active_ttl):
+            gap = self.gaps.get(chat_id)
+            if gap is None:
+                self.gaps[chat_id] = [message_id, None]
+            else:
+                gap[1] = None
+    
+    def observe(self, event):
+        """
+        받은 메시지 ID를 메모리에만 기록 (모든 수신 메시지에서 호출되므로 위치 갱신과 저장은 merge/flush에서)
+        채널/슈퍼그룹 외에는 메시지 ID가 계정마다 다르므로 감시 클라이언트가 받은 메시지만 기록한다.
+        """
+        if not (event.client is self.client or getattr(event, 'is_channel', False)):
+            return
+        message_id = event.message.id
+        if isinstance(event, CatchUpEvent):
+            # 백필한 메시지는 누락 구간 끝으로 쓰지 않고 위치만 갱신
+            self.marks.advance(event.chat_id, message_id)
+            return
+        seen = self.pending.get(event.chat_id)
+        if seen is None:
+            self.pending[event.chat_id] = [message_id, message_id]
+        elif message_id < seen[0]:
+            seen[0] = message_id
+        elif message_id > seen[1]:
+            seen[1] = message_id
+    
+    def merge(self):
+        """기록해 둔 메시지 ID를 채팅방 위치와 누락 구간 끝(구간 이후 처음 받은 실시간 메시지)에 반영"""
+        pending, self.pending = self.pending, {}
+        for chat_id, (first_id, last_id) in pending.items():
+            gap = self.gaps.get(chat_id)
+            if gap is not None and gap[1] is None and first_id > gap[0]:
+                gap[1] = first_id
+            self.marks.advance(chat_id, last_id)
+    
+    def flush(self):
+        self.merge()
+        self.marks.flush()
+    
+    async def _fetch(self, chat_id, min_id, max_id, cutoff):
+        messages = []
+        async with self.semaphore:
+            # max_id=0이면 최신 메시지까지 (아직 실시간 메시지를 받지 못한 채팅방)
+            async for message in self.client.iter_messages(chat_id, min_id=min_id, max_id=max_id or 0,
+                                                           limit=self.limit):
+                if message.date and message.date.timestamp() < cutoff:
+                    return messages, False
+                messages.append(message)
+        return messages, len(messages) >= self.limit
+    
+    async def _backfill_chat(self, chat_id, min_id, max_id, cutoff):
+        try:
+            messages, truncated = await self._fetch(chat_id, min_id, max_id, cutoff)
+        except Exception as e:
+            logging.error(f"백필 조회 실패: chat_id={chat_id}, {e}")
+            return []
+        if truncated:
+            self.truncated += 1
+            logging.warning(f"백필 한도({self.limit}개) 초과, 이전 메시지는 건너뜀: chat_id={chat_id}")
+        
+        tasks = []
+        for message in reversed(messages):  # 오래된 메시지부터
+            age = time.time() - message.date.timestamp() if message.date else 0
+            tasks.append(asyncio.ensure_future(
+                self.handler.process_message(CatchUpEvent(message), f"백필 {age:.0f}초 전")
+            ))
+        self.backfilled += len(tasks)
+        return tasks
+    
+    async def run(self, reason):
+        """열린 누락 구간을 백필. 실행 중에 다시 호출되면 끝난 뒤 한 번 더 실행"""
+        if self.running:
+            self.rerun = True
+            return
+        self.running = True
+        try:
+            while True:
+                self.rerun = False
+                await self._run_gaps(reason)
+                if not self.rerun:
+                    break
+        finally:
+            self.running = False
+    
+    async def _run_gaps(self, reason):
+        self.merge()
+        gaps, self.gaps = self.gaps, {}
+        if not gaps:
+            return
+        try:
+            self.runs += 1
+            cutoff = time.time() - self.max_age if self.max_age else 0
+            logging.info(f"놓친 메시지 백필 시작 ({reason}): 채팅방 {len(gaps)}개")
+            batches = await asyncio.gather(*(
+                self._backfill_chat(chat_id, min_id, max_id, cutoff) for chat_id, (min_id, max_id) in gaps.items()
+            ))
+            tasks = [task for batch in batches for task in batch]
+            logging.info(f"놓친 메시지 백필 조회 완료: {len(tasks)}개 처리 시작")
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            logging.error(f"백필 중 오류: {e}", exc_info=True)
+    
+    def stats(self):
+        return {'runs': self.runs, 'backfilled': self.backfilled, 'truncated_chats': self.truncated,
+                'tracked_chats': len(self.marks.marks), 'open_gaps': len(self.gaps)}
+    
+    def close(self):
+        self.merge()
+        self.marks.close()
+
+class SeenLinkIndex:
+    """
+    링크 단위 중복 제거 인덱스
+    
+    링크를 방 식별자 기준의 정규형으로 줄이고, 참여 완료(또는 진행 중)인 방은 TTL 동안 다시 처리하지 않는다.
+    결과 화면으로 성공을 확인한 방만 joined로 오래 유지하고, 확인하지 못한 방은 attempted,
+    참여 불가로 판정된 방은 failed로 유지하며 이때 사용한 비밀번호와 다른 비밀번호가 담긴 메시지가 오면 다시 시도한다.
+    적중/미스 카운터로 절약된 브라우저 실행 수를 확인할 수 있다.
+    """
+    # 오픈채팅 방/프로필 링크 (뒤에 붙은 추적 파라미터, 문장부호, 한글 등은 식별자에서 제외)
+    KAKAO_LINK_PATTERN = re.compile(r'^(?:https?://)?open\.kakao\.com/(o|me)/([A-Za-z0-9]+)', re.IGNORECASE)
+    TRAILING_PUNCTUATION = '.,;:!?)]}>\'"'
+    PURGE_INTERVAL = 60  # 만료 항목 정리 주기 (초)
+    
+    def __init__(self, ttl=None, inflight_ttl=None, attempt_ttl=None, failed_ttl=None):
+        self.ttl = ttl if ttl is not None else Config.LINK_DEDUPE_TTL
+        self.inflight_ttl = inflight_ttl if inflight_ttl is not None else Config.LINK_INFLIGHT_TTL
+        self.attempt_ttl = attempt_ttl if attempt_ttl is not None else Config.LINK_ATTEMPT_TTL
+        self.failed_ttl = failed_ttl if failed_ttl is not None else Config.LINK_FAILED_TTL
+        self.entries = {}  # 정규화 링크 -> (상태, 만료 시각, 사용한 비밀번호)
+        self.hits = 0
+        self.misses = 0
+        self.last_purge = time.monotonic()
+    
+    @staticmethod
+    def canonicalize(url):
+        """링크를 방 식별자 기준의 정규형 URL로 변환"""
+        match = SeenLinkIndex.KAKAO_LINK_PATTERN.match(url)
+        if match:
+            return f"https://open.kakao.com/{match.group(1).lower()}/{match.group(2)}"
+        
+        # 그 외 링크: fragment와 끝 문장부호 제거, 스킴/호스트 소문자화
+        url = url.split('#', 1)[0].rstrip(SeenLinkIndex.TRAILING_PUNCTUATION)
+        scheme, _, rest = url.partition('://')
+        host, sep, path = rest.partition('/')
+        return f"{scheme.lower()}://{host.lower()}{sep}{path}".rstrip('/')
+    
+    def _purge(self, now):
+        if now - self.last_purge < self.PURGE_INTERVAL:
+            return
+        self.entries = {url: entry for url, entry in self.entries.items() if entry[1] > now}
+        self.last_purge = now
+    
+    STATE_LABELS = {'in_flight': '처리 중인', 'joined': '참여한', 'attempted': '시도한', 'failed': '참여할 수 없는'}
+    RETRYABLE_STATES = ('attempted', 'failed')  # 다른 비밀번호가 오면 다시 시도
+    
+    def claim(self, urls, password=None):
+        """처음 보거나 만료된 링크, 또는 이전 시도와 다른 비밀번호가 온 링크만 진행 중으로 표시하고 반환"""
+        now = time.monotonic()
+        self._purge(now)
+        new_urls = []
+        for url in urls:
+            entry = self.entries.get(url)
+            if entry and entry[1] > now:
+                state, _, tried_password = entry
+                if state in self.RETRYABLE_STATES and password is not None and password != tried_password:
+                    logging.info(f"다른 비밀번호로 다시 시도: {url}")
+                else:
+                    self.hits += 1
+                    logging.info(f"이미 {self.STATE_LABELS[state]} 링크 건너뜀: {url}")
+                    continue
+            self.misses += 1
+            self.entries[url] = ('in_flight', now + self.inflight_ttl, None)
+            new_urls.append(url)
+        return new_urls
+    
+    def complete(self, url, state=None, password=None):
+        """
+        처리 결과 반영: joined(성공 확인)는 TTL, attempted(확인 불가)는 attempt_ttl,
+        failed(참여 불가 판정)는 failed_ttl 동안 유지하고
+        None(오류, 시간 초과 등)이면 다음 메시지에서 다시 시도할 수 있도록 제거
+        """
+        ttl = {'joined': self.ttl, 'attempted': self.attempt_ttl, 'failed': self.failed_ttl}.get(state)
+        if ttl is None:
+            self.entries.pop(url, None)
+        else:
+            self.entries[url] = (state, time.monotonic() + ttl, password)
+    
+    def stats(self):
+        now = time.monotonic()
+        states = [state for state, expires_at, _ in self.entries.values() if expires_at > now]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            **{state: states.count(state) for state in self.STATE_LABELS},
+        }
+
+class KeywordMatcher:
+    """
+    포함/제외 키워드 매칭기
+    
+    포함 패턴(초대 링크 도메인 등)은 몇 개뿐이고 대부분의 메시지를 거르는 첫 단계이므로 정규식 하나로 검사하고,
+    수백 개로 늘어날 수 있는 제외 키워드는 Aho-Corasick 오토마톤으로 만들어 메시지를 한 번만 훑어 찾는다
+    (비용은 키워드 수와 무관하게 메시지 길이에만 비례).
+    대소문자 무시 옵션은 텍스트를 소문자로 바꾸지 않고 대/소문자 전이를 함께 만들어 처리한다.
+    """
+    def __init__(self, include_patterns, exclude_patterns, case_insensitive=False):
+        self.include_patterns = tuple(dict.fromkeys(p for p in include_patterns if p and p.strip()))
+        self.exclude_patterns = tuple(dict.fromkeys(p for p in exclude_patterns if p and p.strip()))
+        self.case_insensitive = case_insensitive
+        
+        # 수신 메시지 대부분을 거르는 첫 단계용 포함 패턴 검사 (C 수준 검색)
+        flags = re.IGNORECASE if case_insensitive else 0
+        patterns = sorted(self.include_patterns, key=len, reverse=True)
+        self.include_regex = re.compile('|'.join(map(re.escape, patterns)), flags) if patterns else None
+        
+        self._build()
+    
+    def _variants(self, ch):
+        if self.case_insensitive:
+            lower, upper = ch.lower(), ch.upper()
+            if len(lower) == 1 and len(upper) == 1:
+                return {lower, upper}
+        return {ch}
+    
+    def _build(self):
+        goto = [{}]       # 노드별 문자 전이
+        fail = [0]        # 실패 링크
+        output = [False]  # 노드에서 끝나는 제외 키워드가 있는지
+        
+        for pattern in self.exclude_patterns:
+            node = 0
+            for ch in pattern:
+                variants = self._variants(ch)
+                nxt = next((goto[node][v] for v in variants if v in goto[node]), None)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    output.append(False)
+                for v in variants:
+                    goto[node][v] = nxt
+                node = nxt
+            output[node] = True
+        
+        # 너비 우선으로 실패 링크 계산 (대소문자 전이는 같은 노드를 가리키므로 한 번만 처리)
+        queue = deque(set(goto[0].values()))
+        visited = set(queue)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                if nxt in visited:
+                    continue
+                visited.add(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if node else 0
+                output[nxt] |= output[fail[nxt]]
+                queue.append(nxt)
+        
+        self.goto = goto
+        self.fail = fail
+        self.output = output
+        # 루트에서는 패턴의 첫 글자가 나올 때까지 C 수준 검색으로 건너뜀
+        first_chars = ''.join(sorted(goto[0]))
+        self.first_char_regex = re.compile('[' + re.escape(first_chars) + ']') if first_chars else None
+    
+    def has_exclude(self, text):
+        """제외 키워드가 하나라도 있으면 True (찾는 즉시 종료)"""
+        if self.first_char_regex is None:
+            return False
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        i = 0
+        n = len(text)
+        while i < n:
+            if node == 0:
+                match = self.first_char_regex.search(text, i)
+                if match is None:
+                    break
+                i = match.start()
+            ch = text[i]
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                return True
+            i += 1
+        return False
+    
+    def has_include(self, text):
+        return self.include_regex is not None and self.include_regex.search(text) is not None
+
+class MessageFilterChain:
+    """
+    메시지 수신 필터 체인
+    
+    시작 시 설정을 한 번만 해석(제외 그룹 ID frozenset 등)하고, 비용이 낮은 단계부터 순서대로 검사한다.
+    키워드가 없는 대부분의 메시지는 첫 단계에서 바로 버려지며, 단계별 통과/제외 수를 기록한다.
+    """
+    BOT_MESSAGE_PREFIX = "Keyword detected message:"
+    BOT_PASSWORD_MARKER = "Password extracted:"
+    
+    # 필터 이후 process_message에서 기록하는 단계
+    PIPELINE_STAGES = ['urls', 'duplicate_message', 'seen_links']
+    
+    def __init__(self):
+        self.excluded_chat_ids = frozenset(
+            abs(int(group)) for group in Config.EXCLUDED_GROUP_IDS if group and group.strip()
+        )
+        # 봇 ID는 토큰 앞부분 (알림 봇이 전달한 원본 사진 메시지를 사용자 계정이 다시 받을 때 구분)
+        bot_id = (Config.BOT_TOKEN or '').partition(':')[0]
+        self.bot_user_id = int(bot_id) if bot_id.isdigit() else None
+        self.matcher = KeywordMatcher(Config.KEYWORDS, Config.EXCLUDED_KEYWORDS, Config.KEYWORD_CASE_INSENSITIVE)
+        
+        # (단계 이름, 검사 함수) - 함수는 None(다음 단계), False(제외), True(이후 필터 생략하고 통과) 반환
+        # 제외 키워드 단계는 런타임에 키워드가 추가될 수 있으므로 항상 포함 (비어 있으면 바로 통과)
+        self.stages = [
+            ('bot_format', self._check_bot_format),
+            ('own_forward', self._check_own_forward),
+            ('outgoing', self._check_outgoing),
+            ('channel', self._check_channel),
+        ]
+        if self.excluded_chat_ids:
+            self.stages.append(('excluded_chat', self._check_excluded_chat))
+        self.stages.append(('excluded_keyword', self._check_excluded_keyword))
+        
+        names = ['keyword'] + [name for name, _ in self.stages] + self.PIPELINE_STAGES
+        self.passed = dict.fromkeys(names, 0)
+        self.dropped = dict.fromkeys(names, 0)
+    
+    def set_keywords(self, include_patterns=None, exclude_patterns=None):
+        """
+        키워드 변경 시 새 오토마톤을 만든 뒤 참조만 교체 (처리 중인 메시지는 이전 오토마톤을 그대로 사용)
+        """
+        current = self.matcher
+        self.matcher = KeywordMatcher(
+            current.include_patterns if include_patterns is None else include_patterns,
+            current.exclude_patterns if exclude_patterns is None else exclude_patterns,
+            current.case_insensitive
+        )
+        logging.info(f"키워드 오토마톤 재구성: 포함 {list(self.matcher.include_patterns)}, "
+                     f"제외 {len(self.matcher.exclude_patterns)}개")
+        return self.matcher
+    
+    def _check_bot_format(self, event, text):
+        # 봇이 보낸 메시지 형식 확인 (순환 방지)
+        if text.startswith(self.BOT_MESSAGE_PREFIX) or self.BOT_PASSWORD_MARKER in text:
+            return False
+        return None
+    
+    def _check_own_forward(self, event, text):
+        # 자신(사용자 계정 또는 알림 봇)이 전달한 메시지는 알림의 메아리이므로 제외 (운영자가 직접 쓴 메시지는 그대로 처리)
+        if event.message.fwd_from and (event.out or (self.bot_user_id and event.sender_id == self.bot_user_id)):
+            return False
+        return None
+    
+    @staticmethod
+    def _check_outgoing(event, text):
+        # 자신의 메시지도 처리 (테스트 목적) - 키워드가 있으면 나머지 제외 조건은 적용하지 않음
+        return True if event.out else None
+    
+    @staticmethod
+    def _check_channel(event, text):
+        # 채널이 아닌 경우만 처리 (개인 메시지나 그룹 메시지만 처리)
+        if getattr(event.chat, 'broadcast', False):
+            return False
+        return None
+    
+    def _check_excluded_chat(self, event, text):
+        return False if abs(event.chat_id) in self.excluded_chat_ids else None
+    
+    def _check_excluded_keyword(self, event, text):
+        return False if self.matcher.has_exclude(text) else None
+    
+    def match_keyword(self, event):
+        """
+        1단계: 포함 키워드 (링크는 텍스트에서만 추출하므로 키워드가 없으면 처리할 것이 없음)
+        대부분의 메시지가 여기서 버려지므로 다른 어떤 처리보다 먼저 호출한다. 통과하면 텍스트, 아니면 None
+        """
+        text = event.message.message
+        if not text or not self.matcher.has_include(text):
+            self.dropped['keyword'] += 1
+            return None
+        self.passed['keyword'] += 1
+        return text
+    
+    def run(self, event, text):
+        """match_keyword를 통과한 메시지에 나머지 단계 적용. 통과하면 텍스트, 제외되면 None 반환"""
+        for name, check in self.stages:
+            verdict = check(event, text)
+            if verdict is False:
+                self.dropped[name] += 1
+                logging.info(f"메시지 무시됨 ({name}): {event.chat_id}")
+                return None
+            self.passed[name] += 1
+            if verdict is True:
+                break
+        return text
+    
+    def record(self, name, passed):
+        """필터 이후 단계의 통과/제외 기록"""
+        if passed:
+            self.passed[name] += 1
+        else:
+            self.dropped[name] += 1
+        return passed
+    
+    def stats(self):
+        return {name: (self.passed[name], self.dropped[name]) for name in self.passed}
+
+class StaleLinkError(Exception):
+    """참여 대기 중 유효 시간(JOIN_MAX_AGE)이 지나 버려진 링크"""
+
+
+class JoinScheduler:
+    """
+    브라우저 참여 작업 우선순위 스케줄러
+    
+    빈 슬롯이 생기면 가장 최근 메시지의 링크부터 실행한다 (채팅방 우선순위만큼 더 최신으로 취급).
+    메시지 수신 후 max_age가 지난 링크는 브라우저를 쓰지 않고 버려,
+    재연결 직후처럼 한꺼번에 몰려온 오래된 링크가 새 링크를 막지 않도록 한다.
+    """
+    def __init__(self, slots, max_age=None, chat_priorities=None):
+        self.slots = slots
+        self.max_age = Config.JOIN_MAX_AGE if max_age is None else max_age
+        if chat_priorities is None:
+            chat_priorities = self.parse_priorities(Config.CHAT_PRIORITIES)
+        self.chat_priorities = chat_priorities
+        self.queue = []  # (우선순위 키, 순번, 메시지 시각, 대기 시작 시각, future) 힙
+        self.sequence = itertools.count()
+        self.running = 0
+        
+        # 통계
+        self.submitted = 0
+        self.started = 0
+        self.shed = 0
+        self.max_depth = 0
+        self.wait_times = deque(maxlen=500)  # 최근 작업의 대기 시간 (초)
+    
+    @staticmethod
+    def parse_priorities(value):
+        """'채팅방ID:초,...' 형식을 {abs(채팅방ID): 초}로 변환"""
+        priorities = {}
+        for item in value.split(','):
+            chat_id, sep, seconds = item.strip().partition(':')
+            if not sep:
+                continue
+            try:
+                priorities[abs(int(chat_id))] = float(seconds)
+            except ValueError:
+                logging.warning(f"잘못된 채팅방 우선순위 설정 무시: {item}")
+        return priorities
+    
+    def priority_key(self, chat_id, message_time):
+        """값이 작을수록 먼저 실행 (최신 메시지, 우선순위 높은 채팅방 순)"""
+        return -(message_time + self.chat_priorities.get(abs(chat_id or 0), 0))
+    
+    def _dispatch(self):
+        while self.running < self.slots and self.queue:
+            _, _, message_time, enqueued_at, future = heapq.heappop(self.queue)
+            if future.done():  # 대기 중 취소된 작업
+                continue
+            now = time.time()
+            if not self.is_fresh(message_time):
+                self.shed += 1
+                future.set_exception(StaleLinkError(f"메시지 수신 후 {now - message_time:.0f}초 경과"))
+                continue
+            self.running += 1
+            self.started += 1
+            self.wait_times.append(now - enqueued_at)
+            future.set_result(None)
+    
+    def _release(self):
+        self.running -= 1
+        self._dispatch()
+    
+    def is_fresh(self, message_time):
+        return not self.max_age or time.time() - message_time <= self.max_age
+    
+    def demand(self):
+        """브라우저가 필요한 작업 수 (실행 중 + 버려지지 않을 대기 작업)"""
+        return self.running + sum(
+            1 for _, _, message_time, _, future in self.queue
+            if not future.done() and self.is_fresh(message_time)
+        )
+    
+    async def run(self, job, chat_id, message_time):
+        """슬롯을 우선순위 순으로 배정받아 job()을 실행. 유효 시간이 지나면 StaleLinkError"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (
+            self.priority_key(chat_id, message_time), next(self.sequence), message_time, time.time(), future
+        ))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._dispatch()
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 슬롯을 배정받은 직후 취소되면 슬롯 반환
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()
+            else:
+                future.cancel()
+            raise
+        
+        try:
+            return await job()
+        finally:
+            self._release()
+    
+    def stats(self):
+        waits = list(self.wait_times)
+        return {
+            'depth': len(self.queue),
+            'running': self.running,
+            'max_depth': self.max_depth,
+            'submitted': self.submitted,
+            'started': self.started,
+            'shed': self.shed,
+            'avg_wait': round(sum(waits) / len(waits), 2) if waits else 0,
+            'max_wait': round(max(waits), 2) if waits else 0,
+        }
+
+class NotificationQueue:
+    """
+    알림 전송 대기열
+    
+    대상 채팅방 제한에 맞춘 토큰 버킷으로 전송 간격을 조절하고, FloodWaitError를 받으면 지정된 시간만큼 쉬었다가
+    같은 요청부터 다시 보낸다. 같은 메시지에 대한 수정 요청은 대기 중 하나로 합쳐 최신 내용만 보낸다.
+    이미 알림을 보낸 링크가 다른 채팅방에서 다시 보이면 기존 알림에 채팅방별 횟수를 덧붙인다.
+    
+    요청은 우선순위(NOTICE: 새 링크 알림, UPDATE: 비밀번호 반영 수정과 사진 전달, TALLY: 횟수 갱신 수정) 순으로 보내고,
+    같은 우선순위 안에서는 먼저 들어온 순서를 지킨다. 대기 요청이 많으면 횟수 갱신 수정은 버린다.
+    """
+    NOTICE, UPDATE, TALLY = range(3)
+    
+    def __init__(self, rate_per_minute=None, burst=None, coalesce_window=None, tally_max_backlog=None):
+        self.rate = (rate_per_minute or Config.NOTIFY_RATE_PER_MINUTE) / 60.0
+        self.burst = max(1, burst or Config.NOTIFY_BURST)
+        self.coalesce_window = Config.NOTIFY_COALESCE_WINDOW if coalesce_window is None else coalesce_window
+        self.tally_max_backlog = Config.NOTIFY_TALLY_MAX_BACKLOG if tally_max_backlog is None else tally_max_backlog
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
         
-        # 숫자 패턴 (세 번째 우선순위)
-        number_patterns = [
-            r'\b([0-9]{4,})\b'  # 숫자만
-        ]
+        self.jobs = [deque() for _ in range(self.TALLY + 1)]  # 우선순위별 대기 요청 (들어온 순서)
+        self.pending = {}    # 합칠 수 있는 요청 (키 -> 요청)
+        self.wakeup = None
+        self.worker = None
         
-        # 모든 패턴 리스트와 설명
-        pattern_groups = [
-            (mixed_patterns, "알파벳+숫자 혼합 패턴"),
-            (english_patterns, "영문 패턴"),
-            (number_patterns, "숫자 패턴")
-        ]
+        self.notices = {}  # 알림 메시지 ID -> {'message', 'text', 'chats', 'origins', 'expires'}
+        self.links = {}    # 정규화 링크 -> 알림 메시지 ID
         
-        # 각 패턴 그룹에 대해 검사
-        for patterns, description in pattern_groups:
-            for pattern in patterns:
-                matches = re.findall(pattern, text_without_urls)
-                
-                # 후보 비밀번호 필터링
-                filtered_matches = []
-                for match in matches:
-                    # 전체 단어 일치 확인 (후보가 제외 단어 목록에 정확히 일치하는지 확인)
-                    if (4 <= len(match) <= 20 and 
-                        match.lower() not in excluded_words_lower and 
-                        PasswordExtractor.is_likely_password(match)):
-                        filtered_matches.append(match)
-                
-                if filtered_matches:
-                    password = filtered_matches[0]
-                    return password
-        
-        # 3. 일반적인 비밀번호 패턴 (문맥 기반 패턴)
-        general_patterns = [
-            # 키워드 관련 패턴
-            r'(?:비밀번호|패스워드|비번|암호)[:\s]*([a-zA-Z0-9]{3,})',
-            r'(?:password|pwd|pw)[:\s]*([a-zA-Z0-9]{3,})',
-            r'(?:입장코드|코드)[:\s]*([a-zA-Z0-9]{3,})',
-            
-            # 문장 중간이나 끝에 있는 영숫자 패턴
-            r'[\s]([a-zA-Z0-9]{4,})[\s]',
-            r'[\s]([a-zA-Z0-9]{4,})$',
-            
-            # 특수문자로 구분된 영숫자 패턴
-            r'[^a-zA-Z0-9]([a-zA-Z0-9]{4,})[^a-zA-Z0-9]',
-        ]
+        # 통계
+        self.sent = 0
+        self.merged = 0
+        self.tallied = 0
+        self.dropped_tallies = 0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0
+    
+    def backlog(self):
+        return sum(len(jobs) for jobs in self.jobs)
+    
+    def submit(self, call, key=None, priority=NOTICE):
+        """
+        call()이 반환하는 코루틴을 우선순위 순으로 실행하는 Future 반환
+        같은 key가 대기 중이면 최신 call로 교체하고 둘 중 높은 우선순위로 옮김.
+        대기 요청이 tally_max_backlog 이상이면 TALLY 요청은 보내지 않고 None으로 완료
+        """
+        if key is not None and key in self.pending:
+            job = self.pending[key]
+            job['call'] = call
+            if priority < job['priority']:
+                self.jobs[job['priority']].remove(job)
+                job['priority'] = priority
+                self.jobs[priority].append(job)
+            self.merged += 1
+            return job['future']
         
-        for pattern in general_patterns:
-            matches = re.findall(pattern, text_without_urls)
-            filtered_matches = [m for m in matches if (4 <= len(m) <= 20 and 
-                                                     m.lower() not in excluded_words_lower and 
-                                                     PasswordExtractor.is_likely_password(m))]
-            if filtered_matches:
-                # 원본 케이스 유지(대소문자 구분)
-                password = filtered_matches[0]
-                return password
+        future = asyncio.get_running_loop().create_future()
+        if priority == self.TALLY and self.backlog() >= self.tally_max_backlog:
+            self.dropped_tallies += 1
+            future.set_result(None)
+            return future
         
-        # 4. 마지막 시도: 단어 단위 분석
-        words = re.findall(r'\b[a-zA-Z0-9]{4,}\b', text_without_urls)
-        filtered_words = []
+        job = {'call': call, 'key': key, 'priority': priority, 'future': future}
+        if key is not None:
+            self.pending[key] = job
+        self.jobs[priority].append(job)
         
-        for word in words:
-            # 전체 단어 일치 확인 (단어가 제외 단어 목록에 정확히 일치하는지 확인)
-            if (4 <= len(word) <= 20 and 
-                word.lower() not in excluded_words_lower and 
-                PasswordExtractor.is_likely_password(word)):
-                filtered_words.append(word)
-        
-        if filtered_words:
-            # 숫자와 문자가 혼합된 단어 우선
-            mixed_words = [w for w in filtered_words if re.search(r'[a-zA-Z]', w) and re.search(r'[0-9]', w)]
-            if mixed_words:
-                # 원본 케이스 유지(대소문자 구분)
-                password = mixed_words[0]
-                return password
+        if self.worker is None or self.worker.done():
+            self.wakeup = asyncio.Event()
+            self.worker = asyncio.ensure_future(self._run())
+        self.wakeup.set()
+        return job['future']
+    
+    async def _acquire_token(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    async def _run(self):
+        while True:
+            if not self.backlog():
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
             
-            # 그다음 영문 단어 우선
-            english_words = [w for w in filtered_words if re.search(r'[a-zA-Z]', w) and not re.search(r'[0-9]', w)]
-            if english_words:
-                password = english_words[0]
-                return password
-                
-            # 마지막으로 숫자 단어
-            number_words = [w for w in filtered_words if re.search(r'[0-9]', w) and not re.search(r'[a-zA-Z]', w)]
-            if number_words:
-                password = number_words[0]
-                return password
+            await self._acquire_token()
+            # 토큰을 기다리는 동안 들어온 더 높은 우선순위 요청부터 보냄
+            job = next(jobs for jobs in self.jobs if jobs).popleft()
+            # 실행을 시작한 요청에는 더 이상 합치지 않음
+            if job['key'] is not None:
+                self.pending.pop(job['key'], None)
             
-            # 그 외의 경우 첫 번째 단어 사용
-            password = filtered_words[0]
-            return password
-        
-        return None
+            while True:
+                try:
+                    result = await job['call']()
+                except FloodWaitError as e:
+                    self.flood_waits += 1
+                    self.flood_wait_seconds += e.seconds
+                    logging.warning(f"텔레그램 전송 제한(FloodWait): {e.seconds}초 대기 후 재개 (대기 {self.backlog()}건)")
+                    await asyncio.sleep(e.seconds)
+                    continue
+                except Exception as e:
+                    if not job['future'].done():
+                        job['future'].set_exception(e)
+                else:
+                    self.sent += 1
+                    if not job['future'].done():
+                        job['future'].set_result(result)
+                break
+    
+    def _purge(self, now):
+        expired = [message_id for message_id, notice in self.notices.items() if notice['expires'] <= now]
+        for message_id in expired:
+            del self.notices[message_id]
+        if expired:
+            self.links = {url: message_id for url, message_id in self.links.items() if message_id in self.notices}
     
     @staticmethod
-    def extract_from_image(image_path):
+    def origin(event):
         """
-        이미지에서 CLOVA OCR API를 사용하여 비밀번호 추출 함수 (간소화 버전)
+        원본 메시지 식별자 (채팅방, 보낸 사람, 보낸 시각, 본문 요약)
+        일반 그룹에서는 두 클라이언트가 같은 메시지를 서로 다른 메시지 ID로 받으므로 ID 대신 내용으로 구분
         """
-        try:
-            # 이미지 파일 존재 확인 (한 번만 체크)
-            if not os.path.isfile(image_path):
-                logging.error(f"이미지 파일이 존재하지 않습니다: {image_path}")
-                return None
-            
-            # CLOVA OCR API URL과 Secret Key 확인
-            if not Config.CLOVA_OCR_API_URL or not Config.CLOVA_OCR_SECRET_KEY:
-                logging.error("CLOVA OCR API URL 또는 Secret Key가 설정되지 않았습니다.")
-                return None
-            
-            # 이미지 읽기
-            image = cv2.imread(image_path)
-            if image is None:
-                logging.error(f"이미지를 읽을 수 없습니다: {image_path}")
-                return None
-            
-            # 이미지 크기 최적화 (필요한 경우)
-            h, w = image.shape[:2]
-            if max(h, w) > Config.MAX_IMAGE_DIMENSION:
-                scale = Config.MAX_IMAGE_DIMENSION / max(h, w)
-                image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
-            
-            # 디버깅 관련 코드는 디버그 모드일 때만 실행
-            if Config.DEBUG_MODE:
-                debug_dir = os.path.join(Config.IMAGE_DIR, "debug")
-                os.makedirs(debug_dir, exist_ok=True)
-                base_filename = os.path.basename(image_path).split('.')[0]
-                cv2.imwrite(os.path.join(debug_dir, f"{base_filename}_resized.png"), image)
-            
-            # OCR API 요청 준비
-            _, img_encoded = cv2.imencode('.png', image)
-            img_bytes = img_encoded.tobytes()
-            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-            
-            # 요청 데이터 구성
-            request_json = {
-                'version': 'V2',
-                'requestId': 'ocr-request-' + hashlib.md5(img_bytes).hexdigest(),
-                'timestamp': int(time.time() * 1000),
-                'images': [
-                    {
-                        'format': 'png',
-                        'name': 'image',
-                        'data': img_base64
-                    }
-                ]
-            }
-            
-            # 요청 헤더 구성
-            headers = {
-                'X-OCR-SECRET': Config.CLOVA_OCR_SECRET_KEY,
-                'Content-Type': 'application/json'
-            }
-            
-            # CLOVA OCR API 호출 - 직접 세션 생성
-            session = requests.Session()
-            session.verify = False
-            
-            # 자동 재시도 설정
-            retry_strategy = Retry(
-                total=3,  # 최대 3번 재시도
-                status_forcelist=[429, 500, 502, 503, 504],  # 재시도할 HTTP 상태 코드
-                allowed_methods=["POST"],  # POST 요청에 대해 재시도 허용
-                backoff_factor=1  # 재시도 간 대기 시간 (초)
-            )
-            adapter = HTTPAdapter(max_retries=retry_strategy)
-            session.mount("http://", adapter)
-            session.mount("https://", adapter)
-            
-            # 연결 타임아웃 및 읽기 타임아웃 설정
-            response = session.post(
-                Config.CLOVA_OCR_API_URL,
-                json=request_json,
-                headers=headers,
-                timeout=(5, 30)  # 연결 타임아웃 5초, 읽기 타임아웃 30초
-            )
-            
-            # 응답 결과 확인
-            if response.status_code != 200:
-                logging.error(f"CLOVA OCR API 오류: 상태 코드 {response.status_code}")
-                return None
-            
-            # 응답 데이터 파싱
-            result = response.json()
-            
-            # 디버깅용 OCR 결과 저장 (디버그 모드일 때만)
-            if Config.DEBUG_MODE:
-                with open(os.path.join(debug_dir, f"{base_filename}_ocr_result.json"), 'w', encoding='utf-8') as f:
-                    json.dump(result, f, ensure_ascii=False, indent=2)
-            
-            # OCR 결과에서 텍스트 추출
-            extracted_texts = []
-            if 'images' in result and result['images']:
-                for image_result in result['images']:
-                    if 'fields' in image_result:
-                        for field in image_result['fields']:
-                            if 'inferText' in field:
-                                extracted_texts.append(field['inferText'])
-            
-            # 추출된 텍스트가 없는 경우
-            if not extracted_texts:
-                return None
-            
-            # 추출된 텍스트를 하나의 문자열로 결합
-            combined_text = ' '.join(extracted_texts)
-            
-            # 디버깅용 추출 텍스트 저장 (디버그 모드일 때만)
-            if Config.DEBUG_MODE:
-                with open(os.path.join(debug_dir, f"{base_filename}_extracted_text.txt"), 'w', encoding='utf-8') as f:
-                    f.write(combined_text)
-            
-            # 추출된 텍스트에서 비밀번호 찾기
-            password = PasswordExtractor.extract_from_text(combined_text)
-            return password
-            
-        except Exception as e:
-            logging.error(f"이미지에서 비밀번호 추출 중 오류: {e}", exc_info=True)
-            return None
-
-class MessageCache:
-    def __init__(self, max_size=500, save_interval=50):
-        self.cache_file = 'message_cache.json'
-        self.max_size = max_size
-        self.save_interval = save_interval
-        self.cache = OrderedDict()
-        self.changes_since_save = 0
-        self._load_cache()
+        message = event.message
+        date = int(message.date.timestamp()) if message.date else None
+        return (abs(event.chat_id or 0), event.sender_id, date, MessageCache.digest(message.message or ""))
     
-    def _load_cache(self):
-        try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                self.cache = OrderedDict(json.load(f))
-        except FileNotFoundError:
-            self.cache = OrderedDict()
-        except Exception as e:
-            logging.error(f"Failed to load cache: {e}")
-            self.cache = OrderedDict()
+    def register(self, sent, text, urls, chat_id, origin=None):
+        """보낸 알림을 링크별로 기억 (집계 시간 동안 같은 링크는 이 알림에 합침)"""
+        if sent is None or not self.coalesce_window:
+            return
+        now = time.monotonic()
+        self._purge(now)
+        self.notices[sent.id] = {
+            'message': sent, 'text': text, 'chats': {abs(chat_id or 0): 1},
+            'origins': {origin} if origin is not None else set(), 'expires': now + self.coalesce_window
+        }
+        for url in urls:
+            self.links[url] = sent.id
     
-    def _save_cache(self):
-        try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(list(self.cache.items()), f, ensure_ascii=False)
-        except Exception as e:
-            logging.error(f"Failed to save cache: {e}")
+    def render(self, message_id, text=None):
+        """알림 본문(text가 있으면 갱신)에 채팅방별 감지 횟수를 덧붙인 최종 메시지"""
+        notice = self.notices.get(message_id)
+        if notice is None:
+            return text
+        if text is not None:
+            notice['text'] = text
+        chats = notice['chats']
+        if len(chats) <= 1 and sum(chats.values()) <= 1:
+            return notice['text']
+        tally = ", ".join(f"{chat_id} ×{count}" for chat_id, count in chats.items())
+        return f"{notice['text']}\n\nSeen in {len(chats)} chats ({sum(chats.values())} times): {tally}"
     
-    def add_message(self, message):
-        message_hash = hashlib.md5(message.encode()).hexdigest()
-        
-        if message_hash in self.cache:
-            return False
-        
-        if len(self.cache) >= self.max_size:
-            self.cache.popitem(last=False)
-        
-        self.cache[message_hash] = message
-        self.changes_since_save += 1
-        
-        # 변경 사항이 일정 수준 이상일 때만 저장
-        if self.changes_since_save >= self.save_interval:
-            self._save_cache()
-            self.changes_since_save = 0
+    def tally(self, urls, chat_id, origin=None):
+        """
+        이미 알림을 보낸 링크를 다시 본 채팅방 집계. 수정할 알림 메시지 목록 반환
+        같은 원본 메시지(origin)는 두 클라이언트가 받아도 한 번만 세고, 채팅방 목록이 바뀐 알림만 수정한다
+        (같은 채팅방의 반복 횟수는 다음 수정 때 함께 반영)
+        """
+        now = time.monotonic()
+        self._purge(now)
+        updated = {}
+        for url in urls:
+            message_id = self.links.get(url)
+            if message_id is None or message_id in updated:
+                continue
+            notice = self.notices[message_id]
+            if origin is not None:
+                if origin in notice['origins']:
+                    continue
+                notice['origins'].add(origin)
+            key = abs(chat_id or 0)
+            new_chat = key not in notice['chats']
+            notice['chats'][key] = notice['chats'].get(key, 0) + 1
+            self.tallied += 1
+            if new_chat:
+                updated[message_id] = notice['message']
+        return list(updated.values())
+    
+    def stats(self):
+        return {
+            'queued': [len(jobs) for jobs in self.jobs],
+            'sent': self.sent,
+            'merged': self.merged,
+            'tallied': self.tallied,
+            'dropped_tallies': self.dropped_tallies,
+            'flood_waits': self.flood_waits,
+            'flood_wait_seconds': self.flood_wait_seconds,
+        }
+    
+    def close(self):
+        if self.worker is not None:
+            self.worker.cancel()
+        for jobs in self.jobs:
+            for job in jobs:
+                if not job['future'].done():
+                    job['future'].cancel()
+            jobs.clear()
+        self.pending.clear()
+
+class NotificationRouter:
+    """
+    알림 라우팅 테이블
+    
+    NOTIFY_ROUTES 규칙을 시작 시 한 번 해석해 출처 채팅방별, 링크 키워드별 대상 목록으로 만들어 두고,
+    감지한 메시지마다 출처 채팅방과 링크에 맞는 대상 채팅방들을 순서대로(중복 없이) 반환한다.
+    """
+    def __init__(self, routes=None, default_target=None, case_insensitive=None):
+        self.case_insensitive = Config.KEYWORD_CASE_INSENSITIVE if case_insensitive is None else case_insensitive
+        self.chat_routes = {}     # abs(출처 채팅방 ID) -> 대상 튜플
+        self.keyword_routes = []  # (키워드, 대상 튜플)
+        self.default_targets = (Config.TARGET_GROUP if default_target is None else default_target,)
+        self._compile(Config.NOTIFY_ROUTES if routes is None else routes)
+    
+    def _compile(self, routes):
+        for rule in routes.split(';'):
+            rule = rule.strip()
+            if not rule:
+                continue
+            source, sep, targets = rule.partition('=')
+            try:
+                target_ids = tuple(dict.fromkeys(int(t) for t in targets.split(',') if t.strip()))
+            except ValueError:
+                target_ids = ()
+            if not sep or not target_ids:
+                logging.warning(f"잘못된 알림 라우팅 규칙 무시: {rule}")
+                continue
+            
+            source = source.strip()
+            if source == '*':
+                self.default_targets = target_ids
+            elif source.startswith('kw:'):
+                keyword = source[3:].strip()
+                self.keyword_routes.append((keyword.lower() if self.case_insensitive else keyword, target_ids))
+            else:
+                try:
+                    self.chat_routes[abs(int(source))] = target_ids
+                except ValueError:
+                    logging.warning(f"잘못된 알림 라우팅 출처 무시: {rule}")
         
-        return True
+        logging.info(f"알림 라우팅: 채팅방 규칙 {len(self.chat_routes)}개, 키워드 규칙 {len(self.keyword_routes)}개, "
+                     f"기본 대상 {list(self.default_targets)}")
     
-    # 종료 시 저장 보장을 위한 메서드 추가
-    def flush(self):
-        if self.changes_since_save > 0:
-            self._save_cache()
-            self.changes_since_save = 0
+    def route(self, chat_id, urls):
+        """출처 채팅방과 링크에 맞는 대상 채팅방 튜플"""
+        targets = list(self.chat_routes.get(abs(chat_id or 0), ()))
+        if self.keyword_routes:
+            joined_urls = "\n".join(urls)
+            if self.case_insensitive:
+                joined_urls = joined_urls.lower()
+            for keyword, target_ids in self.keyword_routes:
+                if keyword in joined_urls:
+                    targets.extend(target_ids)
+        return tuple(dict.fromkeys(targets)) or self.default_targets
 
 class MessageHandler:
-    def __init__(self, client, web_driver, message_cache):
+    CAPTION_LIMIT = 1024  # 텔레그램 미디어 캡션 최대 길이
+    
+    def __init__(self, client, driver_pool, message_cache):
         self.client = client
-        self.web_driver = web_driver
+        self.driver_pool = driver_pool
         self.message_cache = message_cache
+        self.seen_links = SeenLinkIndex()
+        self.recent_updates = RecentUpdateSet()  # 두 클라이언트 핸들러가 공유
+        self.catchup = None  # MissedUpdateCatchUp (main에서 감시 클라이언트와 함께 설정)
+        self.router = NotificationRouter()
+        self.filter_chain = MessageFilterChain()
         
-        # 시스템 CPU 코어 수에 기반한 워커 수 조정
-        optimal_workers = min(os.cpu_count() or 4, Config.NUM_WORKERS)
+        # 브라우저 풀 최대 크기만큼 병렬 처리 (브라우저마다 워커 하나)
+        optimal_workers = driver_pool.max_size
         self.executor = ThreadPoolExecutor(max_workers=optimal_workers)
-        self.semaphore = asyncio.Semaphore(optimal_workers)  # 동시 요청 제한
+        self.join_scheduler = JoinScheduler(optimal_workers)  # 동시 실행 수 제한 및 최신 링크 우선 실행
+        self.ocr_cache = OcrResultCache()
+        self.ocr_client = ClovaOcrClient(cache=self.ocr_cache)
+        # 메시지 수신부터 알림 전송/비밀번호 반영까지 걸린 시간 (초)
+        self.notify_latency = {'first': deque(maxlen=200), 'password': deque(maxlen=200)}
+        # 대상 채팅방마다 별도 전송 대기열 (속도 제한, FloodWait 대기가 다른 대상에 영향을 주지 않음)
+        self.notifiers = {}
         logging.info(f"최적화된 워커 수: {optimal_workers}")
 
     def extract_urls(self, text):
@@ -754,116 +2843,225 @@ class MessageHandler:
                     urls.append(entity.url)
         return urls
 
-    async def send_message_via_bot(self, message_text, media=None):
+    def notifier_for(self, target):
+        notifier = self.notifiers.get(target)
+        if notifier is None:
+            notifier = self.notifiers[target] = NotificationQueue()
+        return notifier
+
+    def notifier_stats(self):
+        return {target: notifier.stats() for target, notifier in self.notifiers.items()}
+
+    async def send_message_via_bot(self, message_text, media=None, target=None, priority=NotificationQueue.NOTICE):
+        target = target or Config.TARGET_GROUP
         try:
-            logging.info(f"메시지 전송 시도: {Config.TARGET_GROUP} - 길이: {len(message_text)}")
+            logging.info(f"메시지 전송 시도: {target} - 길이: {len(message_text)}")
             logging.info(f"메시지 미리보기: {message_text[:100]}...")
             if media:
-                logging.info(f"미디어 파일 첨부: {media}")
+                logging.info(f"미디어 첨부: {type(media).__name__}")
             
-            await self.client.send_message(Config.TARGET_GROUP, message_text, file=media)
-            logging.info(f"메시지 전송 완료: {Config.TARGET_GROUP}")
+            # 속도 제한과 FloodWait 대기는 대상별 전송 대기열이 처리
+            sent = await self.notifier_for(target).submit(
+                lambda: self.client.send_message(target, message_text, file=media), priority=priority
+            )
+            logging.info(f"메시지 전송 완료: {target}")
+            return sent
+        except Exception as e:
+            logging.error(f"메시지 전송 실패: {target}: {e}", exc_info=True)
+            return None
+
+    async def send_notification(self, event, message_text, target=None):
+        """
+        알림 전송. 사진이 있으면 알림 봇이 원본을 재사용 (사용자 계정으로는 대상 채팅방에 아무것도 보내지 않음)
+        봇이 직접 받은 사진은 파일 참조(InputPhoto)로 첨부하고, 사용자 계정이 받은 사진은 봇이 같은 메시지를 볼 수 있는
+        채널/슈퍼그룹이면 봇이 원본 메시지를 전달 (서버 측 복사), 그 외에는 받은 계정으로 내려받아 봇이 올림
+        """
+        target = target or Config.TARGET_GROUP
+        media = event.message.media
+        if not Config.NOTIFY_WITH_MEDIA or not isinstance(media, MessageMediaPhoto):
+            return await self.send_message_via_bot(message_text, target=target)
+        
+        if event.client is self.client:
+            if len(message_text) <= self.CAPTION_LIMIT:
+                return await self.send_message_via_bot(message_text, media=media, target=target)
+            # 캡션 길이 초과 시 텍스트 알림 후 사진만 따로 전송
+            sent = await self.send_message_via_bot(message_text, target=target)
+            await self.send_message_via_bot("", media=media, target=target, priority=NotificationQueue.UPDATE)
+            return sent
+        
+        sent = await self.send_message_via_bot(message_text, target=target)
+        # 채널/슈퍼그룹 메시지 ID는 계정과 무관하게 같으므로 봇이 속해 있으면 그대로 전달 가능
+        if event.is_channel:
+            try:
+                await self.notifier_for(target).submit(
+                    lambda: self.client.forward_messages(target, event.message.id, from_peer=event.chat_id),
+                    priority=NotificationQueue.UPDATE
+                )
+                logging.info(f"원본 사진 메시지 봇 전달 완료: {target}")
+                return sent
+            except Exception as e:
+                logging.info(f"봇이 원본 사진 메시지를 전달할 수 없음, 내려받아 전송: {target}: {e}")
+        try:
+            photo_bytes = await event.download_media(file=bytes)
+        except Exception as e:
+            logging.warning(f"원본 사진 다운로드 실패 (텍스트 알림만 전송됨): {target}: {e}")
+            return sent
+        if photo_bytes:
+            await self.send_message_via_bot("", media=photo_bytes, target=target, priority=NotificationQueue.UPDATE)
+        return sent
+
+    async def edit_message_via_bot(self, sent, message_text=None, fallback=True, target=None):
+        """
+        이미 보낸 알림 메시지 내용 수정 (message_text가 None이면 채팅방별 집계만 갱신)
+        같은 메시지에 대한 수정은 대기열에서 하나로 합쳐지며, 실패하면 fallback일 때만 새 메시지로 전송
+        """
+        target = target or Config.TARGET_GROUP
+        if sent is None:
+            return await self.send_message_via_bot(message_text, target=target) if fallback and message_text else None
+        notifier = self.notifier_for(target)
+        if message_text is not None:
+            notifier.render(sent.id, message_text)  # 본문 갱신 (실제 전송 시점의 최신 내용으로 수정)
+        try:
+            edited = await notifier.submit(
+                lambda: self.client.edit_message(target, sent.id, notifier.render(sent.id) or message_text),
+                key=('edit', sent.id),
+                priority=NotificationQueue.TALLY if message_text is None else NotificationQueue.UPDATE
+            )
+            if edited is None:
+                logging.info(f"전송 대기열이 밀려 횟수 갱신 생략: {target} - message_id={sent.id}")
+                return None
+            logging.info(f"메시지 수정 완료: {target} - message_id={sent.id}")
+            return edited
         except Exception as e:
-            logging.error(f"메시지 전송 실패: {e}", exc_info=True)
+            if not fallback:
+                logging.warning(f"메시지 수정 실패: {target}: {e}")
+                return None
+            logging.error(f"메시지 수정 실패, 새 메시지로 전송: {target}: {e}", exc_info=True)
+            return await self.send_message_via_bot(message_text, target=target)
+    
+    async def _tally_repeated_links(self, urls, event):
+        """다른 채팅방에서 다시 보인 링크는 새 알림 대신 기존 알림의 채팅방별 횟수만 갱신"""
+        origin = NotificationQueue.origin(event)
+        edits = [
+            self.edit_message_via_bot(sent, fallback=False, target=target)
+            for target, notifier in list(self.notifiers.items())
+            for sent in notifier.tally(urls, event.chat_id, origin)
+        ]
+        if edits:
+            await asyncio.gather(*edits)
+    
+    async def _deliver(self, target, event, notice_text, urls, message_time, final_notice):
+        """
+        대상 채팅방 하나에 알림 전송 후, OCR이 진행 중이면 결과(final_notice)를 기다려 같은 메시지를 수정
+        대상마다 독립된 작업으로 실행되므로 느리거나 전송 제한에 걸린 대상이 다른 대상의 전달을 막지 않음
+        """
+        sent = await self.send_notification(event, notice_text, target)
+        if sent is not None:
+            self.notifier_for(target).register(sent, notice_text, urls, event.chat_id, NotificationQueue.origin(event))
+            latency = self._record_notify_latency('first', message_time)
+            logging.info(f"링크 알림 전송: {target} - 메시지 수신 후 {latency:.2f}초")
+        
+        if final_notice is None:
+            return
+        final = await asyncio.shield(final_notice)
+        if final is None:
+            return
+        
+        # 보낸 알림에 OCR 결과 반영 (비밀번호가 없으면 추출 중 표시만 제거)
+        final_text, password = final
+        edited = await self.edit_message_via_bot(sent, final_text, target=target)
+        if edited is not None and password:
+            latency = self._record_notify_latency('password', message_time)
+            logging.info(f"비밀번호 알림 반영: {target} - 메시지 수신 후 {latency:.2f}초")
+
+    @staticmethod
+    def format_notification(message_text, urls, password=None, password_pending=False):
+        message_to_send = f"Keyword detected message:\n{message_text}\n\nLinks:\n"
+        message_to_send += "\n".join(urls)
+        if password:
+            message_to_send += f"\n\nPassword extracted: {password}"
+        elif password_pending:
+            message_to_send += "\n\nPassword: extracting from image..."
+        return message_to_send
+
+    def _record_notify_latency(self, kind, message_time):
+        """메시지 수신 시각 기준 알림 지연 기록 (first: 최초 전송, password: 비밀번호 반영)"""
+        latency = time.time() - message_time
+        self.notify_latency[kind].append(latency)
+        return latency
 
-    async def process_message(self, event):
+    def notify_stats(self):
+        return {
+            kind: round(sum(values) / len(values), 2) if values else None
+            for kind, values in self.notify_latency.items()
+        }
+
+    async def process_message(self, event, source="사용자 계정"):
         try:
-            # 메시지에 키워드가 있는지 확인
-            has_keyword = False
-            if hasattr(event, 'message') and hasattr(event.message, 'message') and event.message.message:
-                if Config.KEYWORD in event.message.message:
-                    has_keyword = True
-                    msg_preview = event.message.message[:50] + "..." if len(event.message.message) > 50 else event.message.message
-                    logging.info(f"키워드 포함 메시지 수신: chat_id={event.chat_id}, message={msg_preview}")
+            # 채팅방 위치는 메모리에만 기록 (저장과 누락 구간 반영은 주기적으로 한꺼번에)
+            if self.catchup:
+                self.catchup.observe(event)
             
-            if not has_keyword and not (event.message.media and isinstance(event.message.media, MessageMediaPhoto)):
+            # 키워드가 없는 대부분의 메시지는 다른 처리 없이 바로 버림
+            text = self.filter_chain.match_keyword(event)
+            if text is None:
                 return
             
-            if self._should_ignore_message(event):
-                if has_keyword:
-                    logging.info(f"메시지 무시됨 (_should_ignore_message 결과): {event.chat_id}")
+            # 다른 클라이언트가 이미 받은 같은 메시지는 나머지 필터와 파싱 전에 제외
+            if not self.recent_updates.claim(event):
+                logging.debug(f"[{source}] 다른 클라이언트에서 처리된 메시지 건너뜀: "
+                              f"chat_id={event.chat_id}, message_id={event.message.id}")
                 return
-
-            urls = self._collect_urls(event)
-            if not urls:
-                if has_keyword:
-                    logging.info(f"URL이 없는 메시지 무시: {event.chat_id}")
+            
+            text = self.filter_chain.run(event, text)
+            if text is None:
                 return
             
-            keyword_urls = list(set(urls))  # _collect_urls에서 이미 키워드 필터링 완료
-            if keyword_urls:
-                logging.info(f"키워드 포함 URL 감지: {keyword_urls}")
-            else:
-                if has_keyword:
-                    logging.info(f"키워드가 포함된 URL이 없는 메시지 무시: {event.chat_id}")
+            msg_preview = text[:50] + "..." if len(text) > 50 else text
+            logging.info(f"[{source}] 키워드 포함 메시지 수신: chat_id={event.chat_id}, message={msg_preview}")
+
+            keyword_urls = self._collect_urls(text)  # 키워드 필터링 및 중복 제거 완료
+            if not self.filter_chain.record('urls', bool(keyword_urls)):
+                logging.info(f"키워드가 포함된 URL이 없는 메시지 무시: {event.chat_id}")
                 return
+            logging.info(f"키워드 포함 URL 감지: {keyword_urls}")
 
-            is_new_message = self.message_cache.add_message(event.message.message)
-            if keyword_urls and is_new_message:
-                logging.info(f"새 메시지 처리 진행: {event.chat_id}")
-                await self._handle_message(event, keyword_urls)
-            elif has_keyword:
+            if not self.filter_chain.record('duplicate_message', self.message_cache.add_message(text)):
                 logging.info(f"중복 메시지로 처리 중단: {event.chat_id}")
-        except Exception as e:
-            logging.error(f"메시지 처리 중 오류 발생: {e}", exc_info=True)
-        
-    def _should_ignore_message(self, event):
-        """
-        메시지를 무시해야 하는지 검사하는 함수
-        """
-        try:
-            # 메시지 출처가 봇인지 확인 (직접적인 방식)
-            if hasattr(event.message, 'message'):
-                # 봇이 보낸 메시지 형식 확인 ('Keyword detected message:'로 시작하거나 'Password extracted:'를 포함)
-                if event.message.message.startswith("Keyword detected message:") or "Password extracted:" in event.message.message:
-                    logging.info(f"봇 형식 메시지 무시 (순환 방지): {event.chat_id}")
-                    return True
-            
-            # 자신의 메시지도 처리 (테스트 목적)
-            if event.out:
-                # 키워드가 포함된 메시지인지 확인
-                if hasattr(event.message, 'message') and Config.KEYWORD in event.message.message:
-                    return False
-                return True
-            
-            # 채널이 아닌 경우 처리 (개인 메시지나 그룹 메시지만 처리)
-            if hasattr(event.chat, 'broadcast') and event.chat.broadcast:
-                return True
-            
-            # 메시지 텍스트가 없는 경우 처리하지 않음 (미디어만 있는 메시지 등)
-            if not hasattr(event.message, 'message') or not event.message.message:
-                if not (event.message.media and isinstance(event.message.media, MessageMediaPhoto)):
-                    return True
-
-            # 제외 그룹 목록에 있는 경우 무시
-            if Config.EXCLUDED_GROUP_IDS and any(abs(event.chat_id) == abs(int(group)) 
-                                              for group in Config.EXCLUDED_GROUP_IDS 
-                                              if group and group.strip()):
-                logging.info(f"제외 그룹 목록에 있는 메시지 무시: {event.chat_id}")
-                return True
+                asyncio.ensure_future(self._tally_repeated_links(keyword_urls, event))
+                return
             
-            # 제외 키워드 포함 메시지 무시
-            if hasattr(event.message, 'message') and event.message.message and Config.EXCLUDED_KEYWORDS:
-                if any(keyword in event.message.message for keyword in Config.EXCLUDED_KEYWORDS if keyword and keyword.strip()):
-                    logging.info(f"제외 키워드가 포함된 메시지 무시: {event.chat_id}")
-                    return True
+            # 이미 참여했거나 처리 중인 방은 제외 (기존 알림에 채팅방별 횟수만 반영)
+            # 이전 시도와 다른 비밀번호(텍스트 또는 이미 OCR한 같은 사진)가 있으면 다시 시도
+            password = PasswordExtractor.extract_from_text(text)
+            known_password = password
+            if known_password is None and isinstance(event.message.media, MessageMediaPhoto):
+                known_password = self.ocr_cache.peek_photo(OcrResultCache.photo_key(event.message.media.photo))
+            new_urls = self.seen_links.claim(keyword_urls, known_password)
+            repeated_urls = [url for url in keyword_urls if url not in new_urls]
+            if repeated_urls:
+                asyncio.ensure_future(self._tally_repeated_links(repeated_urls, event))
+            if not self.filter_chain.record('seen_links', bool(new_urls)):
+                logging.info(f"모든 링크가 이미 처리되어 중단: {event.chat_id}")
+                return
             
-            return False
+            logging.info(f"새 메시지 처리 진행: {event.chat_id}")
+            await self._handle_message(event, new_urls, password)
         except Exception as e:
-            logging.error(f"메시지 필터링 중 오류: {e}", exc_info=True)
-            return True  # 오류 발생 시 안전하게 메시지 무시
-
-    def _collect_urls(self, event):
+            logging.error(f"메시지 처리 중 오류 발생: {e}", exc_info=True)
+        
+    def _collect_urls(self, text):
         urls = []
         
         # 텍스트에서 직접 URL 추출
-        if hasattr(event.message, 'message') and event.message.message:
-            logging.debug(f"메시지 텍스트: {event.message.message}")
-            extracted_urls = self.extract_urls(event.message.message)
+        if text:
+            logging.debug(f"메시지 텍스트: {text}")
+            extracted_urls = self.extract_urls(text)
             if extracted_urls:
                 logging.debug(f"텍스트에서 직접 추출된 URL: {extracted_urls}")
-                # 키워드가 포함된 URL만 필터링
-                urls.extend([url for url in extracted_urls if Config.KEYWORD in url])
+                # 키워드가 포함된 URL만 정규화해 수집 (같은 방의 다른 표기는 하나로 합침)
+                matcher = self.filter_chain.matcher
+                urls.extend([SeenLinkIndex.canonicalize(url) for url in extracted_urls if matcher.has_include(url)])
         
         # 중복 제거 및 로깅
         unique_urls = list(set(urls))
@@ -873,81 +3071,114 @@ class MessageHandler:
             logging.debug("추출된 URL이 없습니다.")
         return unique_urls
 
-    async def _handle_message(self, event, keyword_urls):
+    async def _handle_message(self, event, keyword_urls, password=None):
+        """password는 process_message에서 텍스트로 추출한 비밀번호"""
+        outcomes = {}  # 링크별 (상태, 사용한 비밀번호) - 링크 중복 제거 인덱스에 반영
+        password_future = None
+        final_notice = None
         try:
             logging.info(f"메시지 처리 시작 (_handle_message): chat_id={event.chat_id}")
             message_text = event.message.message
-            password = None
             photo_path = None
             
-            # 텍스트에서 비밀번호 추출 시도
-            logging.info("텍스트에서 비밀번호 추출 시도 중...")
-            password = PasswordExtractor.extract_from_text(message_text)
             if password:
                 logging.info(f"비밀번호 추출: {password}")
             else:
                 logging.info("텍스트에서 비밀번호를 찾지 못했습니다.")
             
+            needs_ocr = not password and isinstance(event.message.media, MessageMediaPhoto)
+            if needs_ocr:
+                # 같은 사진(전달된 사본 포함)은 다운로드 전에 캐시에서 확인 (적중하면 추출 중 알림 없이 최종 알림만 전송)
+                photo_key = OcrResultCache.photo_key(event.message.media.photo)
+                cached, cached_password = self.ocr_cache.get_photo(photo_key)
+                if cached:
+                    logging.info(f"OCR 캐시 적중 (사진 ID), 다운로드 생략: {cached_password}")
+                    password = cached_password
+                    needs_ocr = False
+            if needs_ocr:
+                # OCR 결과는 브라우저 스레드가 페이지 로딩 후 화면 잠금을 잡기 전에 기다림 (그 전까지 페이지 로딩은 먼저 진행)
+                password_future = Future()
+            
+            # URL 처리를 OCR, 알림 전송과 병렬로 바로 시작 (타임아웃 적용)
+            logging.info(f"{len(keyword_urls)}개의 URL 처리 시작...")
+            message_time = event.message.date.timestamp() if event.message.date else time.time()
+            tasks = [
+                asyncio.ensure_future(self._process_url_with_timeout(
+                    url, password_future or password, event.chat_id, message_time
+                ))
+                for url in keyword_urls
+            ]
+            
+            # 링크 감지 알림은 바로 전송하고, OCR 비밀번호는 나중에 같은 메시지를 수정해 반영
+            # 라우팅 규칙에 맞는 모든 대상에 동시에 전송 (대상별로 독립 진행)
+            notice_text = self.format_notification(message_text, keyword_urls, password, password_pending=needs_ocr)
+            final_notice = asyncio.get_running_loop().create_future() if needs_ocr else None
+            targets = self.router.route(event.chat_id, keyword_urls)
+            deliveries = [
+                asyncio.ensure_future(self._deliver(
+                    target, event, notice_text, keyword_urls, message_time, final_notice
+                ))
+                for target in targets
+            ]
+            
             # 이미지에서 비밀번호 추출 시도 (텍스트에서 찾지 못한 경우)
-            if not password and event.message.media and isinstance(event.message.media, MessageMediaPhoto):
+            if needs_ocr:
                 logging.info("이미지에서 비밀번호 추출 시도 중...")
                 try:
-                    if not os.path.exists(Config.IMAGE_DIR):
-                        os.makedirs(Config.IMAGE_DIR)
-                    
-                    photo_path = await event.download_media(file=Config.IMAGE_DIR)
-                    logging.info(f"이미지 다운로드 완료: {photo_path}")
+                    if Config.IN_MEMORY_MEDIA:
+                        # 파일을 거치지 않고 메모리 버퍼로 다운로드해 바로 디코딩
+                        photo_bytes = await event.download_media(file=bytes)
+                        logging.info(f"이미지 메모리 다운로드 완료: {len(photo_bytes) if photo_bytes else 0} bytes")
+                        if photo_bytes:
+                            password = await self.ocr_client.extract_password(
+                                photo_bytes, photo_key,
+                                debug_name=f"photo_{event.message.media.photo.id}"
+                            )
+                    else:
+                        if not os.path.exists(Config.IMAGE_DIR):
+                            os.makedirs(Config.IMAGE_DIR)
+                        
+                        photo_path = await event.download_media(file=Config.IMAGE_DIR)
+                        logging.info(f"이미지 다운로드 완료: {photo_path}")
+                        
+                        password = await self.ocr_client.extract_password(photo_path, photo_key)
+                        
+                        # 처리 후 임시 파일 삭제 (메모리 관리)
+                        if os.path.exists(photo_path):
+                            try:
+                                os.remove(photo_path)
+                            except Exception as e:
+                                logging.warning(f"임시 이미지 파일 삭제 실패: {e}")
                     
-                    password = PasswordExtractor.extract_from_image(photo_path)
                     if password:
                         logging.info(f"이미지에서 비밀번호 추출: {password}")
                     else:
                         logging.info("이미지에서 비밀번호를 찾지 못했습니다.")
-                    
-                    # 처리 후 임시 파일 삭제 (메모리 관리)
-                    if os.path.exists(photo_path):
-                        try:
-                            os.remove(photo_path)
-                        except Exception as e:
-                            logging.warning(f"임시 이미지 파일 삭제 실패: {e}")
                 except Exception as e:
                     logging.error(f"이미지 처리 중 오류: {e}", exc_info=True)
+                finally:
+                    password_future.set_result(password)
+                    final_notice.set_result((self.format_notification(message_text, keyword_urls, password), password))
             
-            # 봇으로 메시지 전송
-            logging.info("메시지 구성 중...")
-            message_to_send = f"Keyword detected message:\n{message_text}\n\nLinks:\n"
-            message_to_send += "\n".join(keyword_urls)
-            
-            if password:
-                message_to_send += f"\n\nPassword extracted: {password}"
-            
-            logging.info("메시지 전송 준비 완료")
+            await asyncio.gather(*deliveries, return_exceptions=True)
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            outcomes = {url: r for url, r in zip(keyword_urls, results) if not isinstance(r, BaseException)}
             
-            try:
-                # 이미지 저장 여부 확인 후 전송
-                if photo_path and os.path.exists(photo_path):
-                    logging.info(f"이미지와 함께 메시지 전송 시도: {photo_path}")
-                    await self.send_message_via_bot(message_to_send, media=photo_path)
-                    logging.info("이미지와 함께 메시지 전송 완료")
-                else:
-                    logging.info("텍스트 메시지만 전송 시도")
-                    await self.send_message_via_bot(message_to_send)
-                    logging.info("텍스트 메시지 전송 완료")
-
-                # URL 처리를 병렬로 실행 (타임아웃 적용)
-                logging.info(f"{len(keyword_urls)}개의 URL 처리 시작...")
-                tasks = [self._process_url_with_timeout(url, password) for url in keyword_urls]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # 예외 처리
-                success_count = sum(1 for r in results if not isinstance(r, Exception))
-                logging.info(f"URL 처리 완료: 성공 {success_count}/{len(keyword_urls)}")
-
-            except Exception as e:
-                logging.error(f"메시지 및 URL 처리 중 오류: {e}", exc_info=True)
+            # 예외 처리
+            success_count = sum(1 for state, _ in outcomes.values() if state != 'failed')
+            logging.info(f"URL 처리 완료: 성공 {success_count}/{len(keyword_urls)}")
         except Exception as e:
             logging.error(f"메시지 처리 함수 실행 중 오류: {e}", exc_info=True)
         finally:
+            # 시작된 URL 작업이 OCR 결과를 무한정 기다리지 않도록 정리
+            if password_future is not None and not password_future.done():
+                password_future.set_result(None)
+            if final_notice is not None and not final_notice.done():
+                final_notice.set_result(None)
+            
+            for url in keyword_urls:
+                self.seen_links.complete(url, *outcomes.get(url, (None, None)))
+            
             # 임시 파일 정리
             if photo_path and os.path.exists(photo_path):
                 try:
@@ -955,59 +3186,106 @@ class MessageHandler:
                 except Exception:
                     pass
 
-    async def _process_url_with_timeout(self, url, password=None):
+    async def _process_url_with_timeout(self, url, password=None, chat_id=None, message_time=None):
         """URL 처리에 타임아웃 적용"""
-        # 세마포어를 사용하여 동시 요청 수 제한
-        async with self.semaphore:
-            try:
-                # 타임아웃 설정으로 URL 처리
-                return await asyncio.wait_for(
-                    self._process_url(url, password),
-                    timeout=Config.URL_TIMEOUT
-                )
-            except asyncio.TimeoutError:
-                logging.error(f"URL 처리 타임아웃: {url}")
-                raise
-            except Exception as e:
-                logging.error(f"URL 처리 오류: {url}: {e}")
-                raise
+        message_time = message_time if message_time is not None else time.time()
+        # 스케줄러 대기열 기준으로 브라우저 풀 확장 (오래되어 버려질 링크는 브라우저를 띄우지 않음)
+        if self.join_scheduler.is_fresh(message_time):
+            self.driver_pool.ensure_capacity(self.join_scheduler.demand() + 1)
+        try:
+            # 스케줄러가 최신 링크부터 슬롯을 배정 (타임아웃은 실행 시간에만 적용)
+            return await self.join_scheduler.run(
+                lambda: asyncio.wait_for(self._process_url(url, password), timeout=Config.URL_TIMEOUT),
+                chat_id,
+                message_time
+            )
+        except StaleLinkError as e:
+            logging.warning(f"오래된 링크 건너뜀: {url} ({e})")
+            raise
+        except asyncio.TimeoutError:
+            logging.error(f"URL 처리 타임아웃: {url}")
+            raise
+        except Exception as e:
+            logging.error(f"URL 처리 오류: {url}: {e}")
+            raise
 
     async def _process_url(self, url, password=None):
+        # 실행자 스레드와 공유하는 재시도 예산 겸 취소 토큰 (타임아웃 시 스레드도 다음 단계에서 중단)
+        budget = RetryBudget()
         try:
             loop = asyncio.get_event_loop()
-            # 실행자에 작업 제출 (타임아웃 처리가 가능한 함수 사용)
             return await loop.run_in_executor(
                 self.executor,
                 self._process_url_sync,
                 url,
-                password
+                password,
+                budget
             )
+        except asyncio.CancelledError:
+            budget.cancel()
+            logging.warning(f"URL 처리 취소, 브라우저 작업 중단 요청: {url}")
+            raise
         except Exception as e:
             logging.error(f"Error delegating URL processing for {url}: {e}")
             raise
 
-    def _process_url_sync(self, url, password=None):
-        retry_count = 0
-        
-        while retry_count < Config.MAX_RETRIES:
-            try:
-                # URL 탐색
-                self.web_driver.navigate(url)
-                
-                # 버튼 클릭
-                self.web_driver.click_button()
-                
-                # 마우스 클릭 수행 (비밀번호 유무에 따라 다른 좌표 사용)
-                self.web_driver.perform_clicks(password)
-                
-                return True
-            except Exception as e:
-                retry_count += 1
-                if retry_count >= Config.MAX_RETRIES:
-                    logging.error(f"URL 처리 최대 재시도 횟수 도달: {url}")
-                    raise
+    def _resolve_password(self, password, budget):
+        """password가 진행 중인 OCR 결과(Future)이면 최대 OCR_PASSWORD_WAIT초 기다려 값 반환"""
+        if not isinstance(password, Future):
+            return password
+        if not password.done():
+            ok, elapsed = wait_until(password.done, Config.OCR_PASSWORD_WAIT, 0.05, budget)
+            if not ok:
+                logging.warning(f"OCR 비밀번호 대기 시간 초과 ({elapsed:.1f}초), 비밀번호 없이 진행")
+                return None
+            logging.info(f"OCR 비밀번호 대기 {elapsed:.2f}초")
+        return password.result()
+    
+    def _process_url_sync(self, url, password=None, budget=None):
+        # 브라우저 대기부터 모든 단계의 재시도까지 하나의 예산 안에서 처리
+        budget = budget or RetryBudget()
+        resolved_password = None
+        try:
+            with self.driver_pool.checkout(timeout=budget.remaining()) as web_driver:
+                web_driver.wait_saved = 0.0
                 
-                time.sleep(Config.RETRY_DELAY)
+                while True:
+                    budget.attempt('join')
+                    try:
+                        # URL 탐색 (브라우저별로 병렬 진행)
+                        web_driver.navigate(url, budget)
+                        
+                        # 이미지 비밀번호는 페이지 로딩 후 여기서 OCR 결과를 기다림 (시간 초과 시 비밀번호 없는 좌표 사용)
+                        # 화면 잠금 밖에서 기다려 다른 브라우저의 클릭 단계를 막지 않음
+                        resolved_password = self._resolve_password(password, budget)
+                        
+                        # 버튼 클릭 후 뜨는 카카오톡 창은 화면 하나를 공유하므로 클릭 단계만 직렬화
+                        # (다른 작업이 화면을 쓰는 동안 이 작업이 취소되거나 시간이 끝나면 기다리지 않고 중단)
+                        with budget.hold(WebDriver.desktop_lock, 'desktop'):
+                            # 버튼 클릭
+                            web_driver.click_button(budget)
+                            
+                            # 마우스 클릭 수행 (비밀번호 유무에 따라 다른 좌표 사용)
+                            web_driver.perform_clicks(resolved_password, budget)
+                            
+                            # 결과 화면 확인 (재시도 불가 실패는 바로 중단)
+                            outcome = web_driver.verifier.verify(Config.CLICK_COORDINATES[0], budget)
+                        
+                        # 결과 화면으로 성공을 확인한 경우만 joined (템플릿이 없거나 판정하지 못하면 attempted)
+                        state = 'joined' if outcome == 'success' else 'attempted'
+                        logging.info(f"참여 완료 ({state}): {url} (조건 대기로 절약한 시간 {web_driver.wait_saved:.2f}초)")
+                        return state, resolved_password
+                    except JoinFailedError as e:
+                        # 같은 비밀번호로 다시 올라온 링크는 브라우저를 띄우지 않도록 failed로 기록
+                        logging.warning(f"참여 불가로 재시도 중단: {url} ({e})")
+                        return 'failed', resolved_password
+                    except RetryBudgetExceeded as e:
+                        logging.error(f"URL 처리 재시도 예산 소진: {url} ({e})")
+                        raise
+                    except Exception as e:
+                        budget.retry('join', e)
+        finally:
+            logging.info(f"URL 처리 종료: {url} - {budget.report()}")
 
     # 종료 시 리소스 정리 메서드 추가
     async def shutdown(self):
@@ -1021,13 +3299,41 @@ class MessageHandler:
         except Exception as e:
             logging.error(f"스레드풀 종료 중 오류: {e}")
         
+        # 알림 대기열 종료
+        for notifier in self.notifiers.values():
+            notifier.close()
+        
+        # OCR 클라이언트 종료
+        try:
+            self.ocr_client.close()
+        except Exception as e:
+            logging.error(f"OCR 클라이언트 종료 중 오류: {e}")
+        
+        # 브라우저 풀 종료
+        try:
+            self.driver_pool.close()
+        except Exception as e:
+            logging.error(f"브라우저 풀 종료 중 오류: {e}")
+        
         # 캐시 저장
+        if self.catchup:
+            try:
+                self.catchup.close()
+            except Exception as e:
+                logging.error(f"채팅방 위치 저장 중 오류: {e}")
+        
         try:
-            self.message_cache.flush()
+            self.message_cache.close()
             logging.info("메시지 캐시 저장 완료")
         except Exception as e:
             logging.error(f"메시지 캐시 저장 중 오류: {e}")
         
+        try:
+            self.ocr_cache.flush()
+            logging.info("OCR 캐시 저장 완료")
+        except Exception as e:
+            logging.error(f"OCR 캐시 저장 중 오류: {e}")
+        
         # 디버그 파일 정리
         try:
             cleanup_debug_files()
@@ -1037,11 +3343,15 @@ class MessageHandler:
         
         logging.info("모든 리소스가 정상적으로 정리되었습니다.")
 
-async def check_connection_status(user_client, bot_client):
+async def check_connection_status(user_client, bot_client, catchup=None):
     """
     텔레그램 API 연결 상태를 주기적으로 확인하는 함수
+    
+    시작 직후와 업데이트 상태가 어긋났을 때 catchup으로 놓친 메시지를 백필한다.
+    연결 끊김/재연결로 인한 누락 구간은 watch_connection이 끊긴 순간에 바로 잡는다.
     """
     first_run = True
+    healthy = True
     
     while True:
         try:
@@ -1075,19 +3385,58 @@ async def check_connection_status(user_client, bot_client):
                     logging.error(f"대상 그룹 확인 실패: {e}")
                 
                 first_run = False
+                if catchup:
+                    asyncio.ensure_future(catchup.run("시작"))
             else:
                 # 오류 검출 목적으로만 확인 (성공 시 로그 없음)
                 await bot_client.get_me()
                 await user_client.get_me()
+                if not healthy and catchup:
+                    asyncio.ensure_future(catchup.run("업데이트 상태 복구"))
+            healthy = True
                 
         except PersistentTimestampOutdatedError as e:
             logging.warning(f"타임스탬프 동기화 오류: {e}")
-            # 필요시 연결 재설정 로직 추가
+            # 업데이트 상태가 어긋나 놓친 메시지가 있을 수 있으므로 지금 위치부터 다음 확인 때 백필
+            if catchup:
+                catchup.open_gap()
+            healthy = False
         except Exception as e:
             logging.error(f"연결 상태 확인 실패: {e}")
         
+        if catchup:
+            catchup.flush()
         await asyncio.sleep(60)  # 1초에서 60초로 변경
 
+def _transport_connected(client):
+    """
+    실제 연결 상태. is_connected()는 사용자가 disconnect()하기 전까지 True를 유지하므로
+    자동 재연결 중인지는 내부 전송 계층 상태로 확인한다 (없으면 is_connected()만 사용)
+    """
+    if not client.is_connected():
+        return False
+    sender = getattr(client, '_sender', None)
+    transport_connected = getattr(sender, '_transport_connected', None)
+    return transport_connected() if transport_connected else True
+
+async def watch_connection(catchup, interval=None):
+    """
+    감시 클라이언트 연결 상태를 짧은 간격으로 확인해 끊긴 순간 누락 구간을 열고, 다시 연결되면 백필
+    텔레그램 자동 재연결이 get_me 확인 주기보다 빨리 끝나도 그 사이 놓친 메시지를 백필할 수 있다.
+    """
+    interval = interval or Config.CATCHUP_WATCH_INTERVAL
+    connected = True
+    while True:
+        now_connected = _transport_connected(catchup.client)
+        if connected and not now_connected:
+            logging.warning("감시 클라이언트 연결 끊김, 누락 구간 기록")
+            catchup.open_gap()
+        elif not connected and now_connected:
+            logging.info("감시 클라이언트 연결 회복")
+            asyncio.ensure_future(catchup.run("재연결"))
+        connected = now_connected
+        await asyncio.sleep(interval)
+
 async def main():
     logging.info("봇 초기화 중...")
     logging.info("==================")
@@ -1096,9 +3445,10 @@ async def main():
     logging.info("==================")
     
     try:
-        logging.info("웹 드라이버 초기화 중...")
-        # 웹 드라이버 초기화
-        web_driver = WebDriver()
+        logging.info("웹 드라이버 풀 초기화 중...")
+        # 웹 드라이버 풀 초기화 (사전 실행)
+        driver_pool = WebDriverPool()
+        driver_pool.start()
         
         logging.info("Telegram 클라이언트 초기화 중...")
         # 봇 클라이언트 초기화
@@ -1133,7 +3483,9 @@ async def main():
         message_cache = MessageCache()
         
         # URL 프로세서 초기화 (봇 클라이언트 전달)
-        url_processor = MessageHandler(bot_client, web_driver, message_cache)
+        url_processor = MessageHandler(bot_client, driver_pool, message_cache)
+        # 사용자 계정 기준으로 채팅방별 마지막 메시지 위치를 기록하고 재연결 시 백필 (봇 계정은 기록 조회 불가)
+        url_processor.catchup = MissedUpdateCatchUp(user_client, url_processor)
         
         # 핑 명령어 핸들러 (봇 클라이언트에 등록)
         @bot_client.on(events.NewMessage(pattern='/ping'))
@@ -1153,15 +3505,8 @@ async def main():
         @user_client.on(events.NewMessage)
         async def user_message_handler(event):
             try:
-                # 키워드가 포함된 메시지만 상세 로깅 
-                if hasattr(event.message, 'message') and event.message.message:
-                    # 키워드가 포함된 경우만 로깅
-                    if Config.KEYWORD in event.message.message:
-                        msg_preview = event.message.message[:30] + "..." if len(event.message.message) > 30 else event.message.message
-                        logging.info(f"[사용자 계정] 키워드 포함 메시지 수신: chat_id={event.chat_id}, message={msg_preview}")
-                
-                # URL 프로세서에 메시지 처리 위임
-                await url_processor.process_message(event)
+                # URL 프로세서에 메시지 처리 위임 (필터와 로깅은 process_message에서 한 번만 수행)
+                await url_processor.process_message(event, "사용자 계정")
             except Exception as e:
                 logging.error(f"메시지 처리 중 오류: {e}", exc_info=True)
         
@@ -1169,19 +3514,50 @@ async def main():
         @bot_client.on(events.NewMessage)
         async def bot_message_handler(event):
             try:
-                # 키워드가 포함된 메시지만 상세 로깅
-                if hasattr(event.message, 'message') and event.message.message:
-                    # 키워드가 포함된 경우만 로깅
-                    if Config.KEYWORD in event.message.message:
-                        msg_preview = event.message.message[:30] + "..." if len(event.message.message) > 30 else event.message.message
-                        logging.info(f"[봇 계정] 키워드 포함 메시지 수신: chat_id={event.chat_id}, message={msg_preview}")
-                
                 # 명령어가 아닌 경우만 처리 (명령어는 위의 핸들러에서 처리)
-                if not event.message.message.startswith('/'):
-                    await url_processor.process_message(event)
+                text = event.message.message
+                if not (text and text.startswith('/')):
+                    await url_processor.process_message(event, "봇 계정")
             except Exception as e:
                 logging.error(f"메시지 처리 중 오류: {e}", exc_info=True)
         
+        # 키워드 변경 명령어 핸들러 (관리자만 가능)
+        # /keywords                            - 현재 키워드 표시
+        # /keywords <include|exclude> <add|remove> <키워드>
+        @bot_client.on(events.NewMessage(pattern=r'/keywords(?:\s|$)'))
+        async def keywords_handler(event):
+            if event.chat_id != int(os.getenv("ADMIN_CHAT_ID", "0")):
+                await bot_client.send_message(event.chat_id, "권한이 없습니다.")
+                return
+            
+            filter_chain = url_processor.filter_chain
+            parts = event.message.message.split(maxsplit=3)
+            if len(parts) == 4 and parts[1] in ('include', 'exclude') and parts[2] in ('add', 'remove'):
+                _, target, action, keyword = parts
+                matcher = filter_chain.matcher
+                current = list(matcher.include_patterns if target == 'include' else matcher.exclude_patterns)
+                if action == 'add' and keyword not in current:
+                    current.append(keyword)
+                elif action == 'remove' and keyword in current:
+                    current.remove(keyword)
+                if target == 'include' and not current:
+                    await bot_client.send_message(event.chat_id, "포함 키워드는 하나 이상 필요합니다.")
+                    return
+                if target == 'include':
+                    filter_chain.set_keywords(include_patterns=current)
+                else:
+                    filter_chain.set_keywords(exclude_patterns=current)
+            elif len(parts) > 1:
+                await bot_client.send_message(event.chat_id, "사용법: /keywords <include|exclude> <add|remove> <키워드>")
+                return
+            
+            matcher = filter_chain.matcher
+            await bot_client.send_message(
+                event.chat_id,
+                f"포함 키워드: {', '.join(matcher.include_patterns)}\n"
+                f"제외 키워드: {', '.join(matcher.exclude_patterns) or '없음'}"
+            )
+        
         # 종료 명령어 핸들러 추가
         @bot_client.on(events.NewMessage(pattern='/shutdown'))
         async def shutdown_handler(event):
@@ -1192,16 +3568,9 @@ async def main():
             logging.info("종료 명령 수신")
             await bot_client.send_message(event.chat_id, "봇을 종료합니다...")
             
-            # 리소스 정리
+            # 리소스 정리 (브라우저 풀 종료 포함)
             await url_processor.shutdown()
             
-            # 웹 드라이버 종료
-            try:
-                web_driver.quit()
-                logging.info("웹 드라이버 종료 완료")
-            except Exception as e:
-                logging.error(f"웹 드라이버 종료 중 오류: {e}")
-            
             # 클라이언트 연결 종료
             await bot_client.disconnect()
             await user_client.disconnect()
@@ -1214,7 +3583,8 @@ async def main():
         # 연결 상태 확인 및 자가 진단 작업 시작
         logging.info("연결 상태 모니터링 및 자가 진단 시작")
         loop = asyncio.get_event_loop()
-        loop.create_task(check_connection_status(user_client, bot_client))
+        loop.create_task(check_connection_status(user_client, bot_client, url_processor.catchup))
+        loop.create_task(watch_connection(url_processor.catchup))
         
         # 자가 진단 방식 수정 (봇에서 봇으로 메시지를 보낼 수 없음)
         @bot_client.on(events.NewMessage(pattern='/debug'))
@@ -1233,7 +3603,18 @@ async def main():
                             f"시간: {time.strftime('%Y-%m-%d %H:%M:%S')}\n" \
                             f"봇 이름: {me.first_name} (@{me.username})\n" \
                             f"대상 그룹: {target_info}\n" \
-                            f"WebDriver 상태: 활성화"
+                            f"WebDriver 풀 상태: {driver_pool.stats()}\n" \
+                            f"OCR 캐시: {url_processor.ocr_cache.stats()}\n" \
+                            f"OCR 업로드 절감: {url_processor.ocr_client.bytes_saved:,} bytes\n" \
+                            f"참여 대기열: {url_processor.join_scheduler.stats()}\n" \
+                            f"평균 알림 지연(초): {url_processor.notify_stats()}\n" \
+                            f"알림 대기열: {url_processor.notifier_stats()}\n" \
+                            f"버튼 위치 탐색: {WebDriver.locator.stats() if WebDriver.locator else '미사용'}\n" \
+                            f"참여 결과 판정: {WebDriver.verifier.stats() if WebDriver.verifier else '미사용'}\n" \
+                            f"링크 중복 제거: {url_processor.seen_links.stats()}\n" \
+                            f"클라이언트 간 중복 제거: {url_processor.recent_updates.stats()}\n" \
+                            f"놓친 메시지 백필: {url_processor.catchup.stats()}\n" \
+                            f"필터 단계별 (통과, 제외): {url_processor.filter_chain.stats()}"
                 await bot_client.send_message(event.chat_id, status_msg)
             except Exception as e:
                 logging.error(f"자가 진단 중 오류: {e}")
@@ -1255,11 +3636,6 @@ async def main():
                 await url_processor.shutdown()
             except Exception as e:
                 logging.error(f"리소스 정리 중 오류: {e}")
-            
-            try:
-                web_driver.quit()
-            except Exception as e:
-                logging.error(f"웹 드라이버 종료 중 오류: {e}")
                 
             logging.info("봇 종료 완료")
     except Exception as e: